@@ -0,0 +1,56 @@
+"""Benchmark the species rewriting of the CET unit registry.
+
+Compares the rewriting of unit strings by `CETUnitRegistry._preprocess` and
+`CETUnitRegistry._postprocess` against the previous implementation, which
+built a new regex with all species on every call. Run with:
+
+    python benchmarks/species.py
+"""
+
+from re import sub
+from timeit import timeit
+
+from cet_units import ureg
+
+NUMBER = 20
+
+
+def _preprocess_uncompiled(s: str):
+    return sub(
+        rf"(g|t|gram|metric_ton) ({'|'.join(ureg.species)})", r"\1__\2", s
+    )
+
+
+def _postprocess_uncompiled(s: str):
+    return sub(
+        rf"(g|t|gram|metric_ton)__({'|'.join(ureg.species)})", r"\1 \2", s
+    )
+
+
+def main():
+    """Run benchmark and print results."""
+    raw = [f"{p}t {s}/a" for s in ureg.species for p in ("", "k", "M")]
+    raw += [f"{p}g {s}/MWh" for s in ureg.species for p in ("", "k")]
+    mangled = [ureg._preprocess(s) for s in raw]
+
+    # Results must be identical to the previous implementation.
+    assert [_preprocess_uncompiled(s) for s in raw] == mangled
+    assert [_postprocess_uncompiled(s) for s in mangled] == raw
+    assert [ureg._postprocess(s) for s in mangled] == raw
+
+    print(f"{len(raw)} unit strings with {len(ureg.species)} species.")
+    for name, func_old, func_new, strings in [
+        ("preprocess", _preprocess_uncompiled, ureg._preprocess, raw),
+        ("postprocess", _postprocess_uncompiled, ureg._postprocess, mangled),
+    ]:
+        t_old = timeit(lambda: [func_old(s) for s in strings], number=NUMBER)
+        t_new = timeit(lambda: [func_new(s) for s in strings], number=NUMBER)
+        n = NUMBER * len(strings)
+        print(
+            f"{name:>12}: {t_old / n * 1e6:8.2f} us -> "
+            f"{t_new / n * 1e6:8.2f} us per call ({t_old / t_new:.0f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
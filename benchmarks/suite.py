@@ -0,0 +1,290 @@
+"""Benchmark suite for typical workloads of the CET unit registry.
+
+Measures importing the package, setting up the registry, defining flows,
+parsing, converting (with assessment contexts and between currencies),
+formatting, converting NumPy arrays, converting with a frozen registry
+shared by threads, and searching names without the registry. Results can
+be saved as JSON baselines and compared against later runs.
+
+No baselines are committed, as timings depend on the machine. Save one on
+the base commit first (e.g. in CI before checking out the changes) and
+compare on the same machine:
+
+    git checkout main
+    python benchmarks/suite.py --save benchmarks/baselines/main.json
+    git checkout -
+    python benchmarks/suite.py --compare benchmarks/baselines/main.json
+
+When comparing, the exit code is 1 if any benchmark is slower than the
+baseline by more than the threshold (default 20 %).
+"""
+
+import json
+import os
+import subprocess
+import sys
+from argparse import ArgumentParser
+from fnmatch import fnmatch
+from importlib.metadata import version
+from pathlib import Path
+from statistics import median
+from tempfile import TemporaryDirectory
+from timeit import Timer
+
+from cet_units import UNIT_DEFS_PATH, ureg
+from cet_units.registry import CETUnitRegistry
+from cet_units_convert._search import SearchIndex
+
+# Registered benchmarks, mapping names to functions returning the statement
+# to time and optionally a setup to run before each repetition.
+BENCHMARKS = {}
+
+# Folder with warm snapshots for setting up registries quickly.
+SNAPSHOT_FOLDER = TemporaryDirectory()
+
+
+def benchmark(name: str, number: int = 1, repeat: int = 5):
+    """Register a benchmark timed `repeat` times over `number` calls."""
+
+    def decorator(func):
+        BENCHMARKS[name] = (func, number, repeat)
+        return func
+
+    return decorator
+
+
+def _fresh_registry() -> CETUnitRegistry:
+    return CETUnitRegistry.from_unit_defs(UNIT_DEFS_PATH, SNAPSHOT_FOLDER.name)
+
+
+def _import(cache_folder: str):
+    env = os.environ | {"CET_UNITS_CACHE_FOLDER": cache_folder}
+    cmd = [sys.executable, "-c", "import cet_units; cet_units.ureg"]
+    return lambda: subprocess.run(cmd, env=env, check=True)
+
+
+# Without snapshots, the compiled definitions are loaded.
+@benchmark("import/compiled", repeat=3)
+def _():
+    return _import("")
+
+
+@benchmark("import/snapshot", repeat=3)
+def _():
+    _fresh_registry()
+    return _import(SNAPSHOT_FOLDER.name)
+
+
+@benchmark("setup/compiled", repeat=3)
+def _():
+    return lambda: CETUnitRegistry.from_unit_defs(UNIT_DEFS_PATH)
+
+
+@benchmark("setup/text", repeat=3)
+def _():
+    def setup():
+        ureg = CETUnitRegistry()
+        ureg._setup_cet_defs(UNIT_DEFS_PATH, use_compiled=False)
+
+    return setup
+
+
+@benchmark("setup/snapshot")
+def _():
+    _fresh_registry()
+    return _fresh_registry
+
+
+@benchmark("define_flows/stored")
+def _():
+    registries = []
+    return (
+        lambda: registries[-1].define_flows(registries[-1].stored_flows),
+        lambda: registries.append(_fresh_registry()),
+    )
+
+
+@benchmark("search/load", number=20)
+def _():
+    return lambda: SearchIndex.load(UNIT_DEFS_PATH)
+
+
+@benchmark("search/query", number=200)
+def _():
+    index = SearchIndex.load(UNIT_DEFS_PATH)
+    return lambda: index.search("MWh NG HHV")
+
+
+@benchmark("parse/species", number=20)
+def _():
+    strings = [f"{p}t {s}/a" for s in ureg.species for p in ("", "k", "M")]
+    return lambda: [ureg.Quantity(s) for s in strings]
+
+
+for _assessment in ureg.assessments:
+
+    @benchmark(f"convert/{_assessment}", number=1000)
+    def _(assessment=_assessment):
+        q = ureg.Quantity(1.0, "Mt CH4")
+        return lambda: q.to("Mt CO2eq", assessment)
+
+
+@benchmark("convert/currency_chain", number=200)
+def _():
+    chain = ["USD_2015", "USD_2020", "EUR_2020", "EUR_2024", "USD_2024"]
+
+    def stmt():
+        q = ureg.Quantity(1.0, "EUR_2015")
+        for unit in chain:
+            q = q.to(unit)
+
+    return stmt
+
+
+@benchmark("format/species", number=20)
+def _():
+    quantities = [ureg.Quantity(1.0, f"kt {s}/a") for s in ureg.species]
+    return lambda: [f"{q}" for q in quantities]
+
+
+@benchmark("array/gwp", number=20)
+def _():
+    import numpy as np
+
+    q = ureg.Quantity(np.linspace(0.0, 1.0, 100_000), "t CH4")
+    return lambda: q.to("kt CO2eq", "AR6GWP100")
+
+
+@benchmark("array/flow", number=20)
+def _():
+    import numpy as np
+
+    q = ureg.Quantity(np.linspace(0.0, 1.0, 100_000), "kg_H2")
+    return lambda: q.to("MWh_H2_LHV")
+
+
+@benchmark("threads/frozen", number=5)
+def _():
+    from concurrent.futures import ThreadPoolExecutor
+
+    registry = _fresh_registry()
+    registry.freeze()
+    q = registry.Quantity(1.0, "Mt CH4")
+    contexts = registry.assessments * 100
+
+    def stmt():
+        with ThreadPoolExecutor(8) as executor:
+            return list(
+                executor.map(
+                    lambda c: q.to("Mt CO2eq", c), contexts, chunksize=50
+                )
+            )
+
+    return stmt
+
+
+def run(pattern: str = "*") -> dict:
+    """Run benchmarks matching pattern and return times per call."""
+    results = {}
+    for name, (func, number, repeat) in BENCHMARKS.items():
+        if not fnmatch(name, pattern):
+            continue
+        stmt = func()
+        setup = "pass"
+        if isinstance(stmt, tuple):
+            stmt, setup = stmt
+        times = [
+            t / number
+            for t in Timer(stmt, setup).repeat(repeat=repeat, number=number)
+        ]
+        results[name] = {"min": min(times), "median": median(times)}
+        print(f"{name:>28}: {_format_time(results[name]['min'])}")
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """Print comparison with baseline and return names of regressions."""
+    regressions = []
+    print(f"\nComparison with baseline of {baseline['commit']}:")
+    for name, result in results.items():
+        if name not in baseline["results"]:
+            continue
+        ratio = result["min"] / baseline["results"][name]["min"]
+        flag = ""
+        if ratio > 1.0 + threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:>28}: {ratio:6.2f}x{flag}")
+    return regressions
+
+
+def _format_time(t: float) -> str:
+    for unit, scale in (("s", 1.0), ("ms", 1e-3), ("us", 1e-6)):
+        if t >= scale:
+            return f"{t / scale:8.2f} {unit}"
+    return f"{t / 1e-9:8.2f} ns"
+
+
+def _commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main():
+    """Run benchmarks, optionally saving or comparing results."""
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--filter",
+        default="*",
+        help="Run only benchmarks matching a glob pattern, e.g. 'convert/*'.",
+    )
+    parser.add_argument(
+        "--save", type=Path, help="Save results as baseline to a JSON file."
+    )
+    parser.add_argument(
+        "--compare", type=Path, help="Compare results with a JSON baseline."
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="Relative slowdown counted as regression (default: 0.2).",
+    )
+    args = parser.parse_args()
+    if args.compare and not args.compare.exists():
+        parser.error(
+            f"baseline {args.compare} not found, save one on the base commit "
+            "with --save first"
+        )
+
+    results = run(args.filter)
+
+    if args.save:
+        args.save.parent.mkdir(parents=True, exist_ok=True)
+        with open(args.save, "w") as file_handle:
+            json.dump(
+                {
+                    "commit": _commit(),
+                    "python": sys.version.split()[0],
+                    "pint": version("pint"),
+                    "results": results,
+                },
+                file_handle,
+                indent=2,
+            )
+    if args.compare:
+        with open(args.compare) as file_handle:
+            baseline = json.load(file_handle)
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,19 +5,24 @@ package built on top of pint. It defines units that help analysing common
 problems in energy systems, industrial ecology, and climate mitigation.
 """
 
+from os import environ
 from pathlib import Path
 
 from pint import set_application_registry
 
+from .conversion import convert_table
 from .registry import CETUnitRegistry
 
 # Define path to unit definitions.
 UNIT_DEFS_PATH: Path = Path(__file__).parent / "unit_definitions"
 
+# Define folder for snapshots of the registry, e.g. ":auto:" for the user
+# cache folder. Snapshots are disabled unless the environment variable is set.
+CACHE_FOLDER: str = environ.get("CET_UNITS_CACHE_FOLDER", "")
+
 
 # Create registry and load from definitions.
-ureg = CETUnitRegistry()
-ureg._setup_cet_defs(UNIT_DEFS_PATH)
+ureg = CETUnitRegistry.from_unit_defs(UNIT_DEFS_PATH, CACHE_FOLDER)
 Quantity = Q = ureg.Quantity
 Unit = U = ureg.Unit
 
@@ -31,5 +36,6 @@ __all__ = [
     "Quantity",
     "U",
     "Unit",
+    "convert_table",
     "ureg",
 ]
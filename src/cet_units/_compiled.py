@@ -0,0 +1,457 @@
+"""Compile unit definitions into a compact binary file and load them."""
+
+import json
+import sys
+from array import array
+from dataclasses import dataclass, field
+from hashlib import sha256
+from pathlib import Path
+
+import pint
+from pint.facets.context.definitions import ContextDefinition
+from pint.facets.plain.definitions import (
+    PrefixDefinition,
+    ScaleConverter,
+    UnitDefinition,
+)
+from pint.facets.plain.registry import RegistryCache
+from pint.util import ParserHelper, UnitsContainer
+
+from ._snapshot import RegistrySnapshot
+
+# Name of the compiled definitions file in the generated definitions folder.
+COMPILED_FILE = "definitions.bin"
+
+# Magic bytes at the start of compiled definitions files.
+COMPILED_MAGIC = b"CETUDEF\0"
+
+# Version of the compiled format. Increase when the layout changes.
+COMPILED_FORMAT = 3
+
+# Columns of compiled definitions files and their array type codes. Strings
+# and units containers are stored once and referred to by their index.
+COLUMNS = {
+    # End offsets of strings in the string data.
+    "string_end": "i",
+    "string_data": "B",
+    # End offsets of units containers and their names and exponents.
+    "container_end": "i",
+    "container_name": "i",
+    "container_exponent": "d",
+    "container_exponent_int": "B",
+    # Definitions of units and prefixes in the order in which they are added
+    # during setup (group -1) or redefined by a context (index of context).
+    "definition_group": "i",
+    "definition_kind": "B",
+    "definition_name": "i",
+    "definition_symbol": "i",
+    "definition_alias_end": "i",
+    "definition_alias": "i",
+    "definition_scale": "d",
+    "definition_scale_int": "B",
+    "definition_reference": "i",
+    # Registry cache: factors to root units and dimensionalities of units,
+    # and units by dimensionality.
+    "root_name": "i",
+    "root_factor": "d",
+    "root_factor_int": "B",
+    "root_units": "i",
+    "dimensionality_name": "i",
+    "dimensionality_units": "i",
+    "equivalents_dimensionality": "i",
+    "equivalents_end": "i",
+    "equivalents_name": "i",
+}
+
+# Kinds of compiled definitions.
+_UNIT, _PREFIX = 0, 1
+
+
+@dataclass
+class CompiledDefinitions:
+    """Unit definitions loaded from a compiled definitions file.
+
+    Attributes
+    ----------
+    definitions : list
+        Definitions added when the CET unit definitions are set up in the
+        order in which they are added.
+    contexts : dict[str, ContextDefinition]
+        Definitions of the assessment contexts by name.
+    cache : RegistryCache | None
+        The registry cache built after all definitions were loaded, or None
+        if the file was compiled with another version of pint.
+
+    """
+
+    definitions: list = field(default_factory=list)
+    contexts: dict = field(default_factory=dict)
+    cache: RegistryCache | None = None
+
+
+def source_hash(unit_defs_path: Path) -> str:
+    """Compute hash of the text files that definitions are compiled from.
+
+    Flows are not compiled, as they are defined on demand.
+
+    Parameters
+    ----------
+    unit_defs_path : Path
+        Path to the unit definitions directory.
+
+    """
+    h = sha256(f"{COMPILED_FORMAT}".encode())
+    flows_path = unit_defs_path / "generated" / "flows"
+    for fpath in sorted(unit_defs_path.rglob("*.txt")):
+        if fpath.is_relative_to(flows_path):
+            continue
+        h.update(fpath.relative_to(unit_defs_path).as_posix().encode())
+        h.update(fpath.read_bytes())
+    return h.hexdigest()
+
+
+def registry_settings(ureg) -> dict:
+    """Return the settings of a registry that definitions depend on.
+
+    Compiled definitions can only be used by registries created with the
+    same settings as the registry they were compiled with, i.e. loading the
+    same default definitions and parsing numbers and names the same way.
+
+    Parameters
+    ----------
+    ureg : CETUnitRegistry
+        Registry created with the settings.
+
+    """
+    # Snapshots replay pint's default definitions.
+    filename = ureg._filename
+    if isinstance(filename, RegistrySnapshot):
+        filename = ""
+    non_int_type = ureg.non_int_type
+    return {
+        "filename": None if filename is None else str(filename),
+        "non_int_type": f"{non_int_type.__module__}.{non_int_type.__name__}",
+        "case_sensitive": ureg.case_sensitive,
+    }
+
+
+def compile_definitions(unit_defs_path: Path) -> bytes:
+    """Compile the unit definitions of a directory into binary form.
+
+    The compiled definitions contain the units and prefixes added during
+    setup, the redefinitions of the assessment contexts, and the registry
+    cache with the factors to root units and dimensionalities. They are
+    stored as numeric columns and a string table, so that they can be
+    loaded without parsing the text files.
+
+    Parameters
+    ----------
+    unit_defs_path : Path
+        Path to the unit definitions directory.
+
+    Raises
+    ------
+    ValueError
+        If a definition cannot be compiled, e.g. a unit with an offset.
+
+    """
+    from .registry import CETUnitRegistry
+
+    ureg = CETUnitRegistry()
+    ureg._setup_cet_defs(unit_defs_path, use_compiled=False)
+    writer = _Writer()
+    for definition in ureg._setup_definitions:
+        writer.add_definition(-1, definition)
+    contexts = list(ureg._lazy_contexts.items())
+    for group, (name, fpath) in enumerate(contexts):
+        parsed = ureg._def_parser.parse_file(fpath)
+        (context,) = ureg._def_parser.iter_parsed_project(parsed)
+        if (
+            not isinstance(context, ContextDefinition)
+            or context.name != name
+            or context.aliases
+            or context.defaults
+            or context.relations
+        ):
+            raise ValueError(f"Cannot compile context: {name}")
+        for definition in context.redefinitions:
+            writer.add_definition(group, definition)
+    writer.add_cache(ureg._cache)
+
+    header = {
+        "format": COMPILED_FORMAT,
+        "byteorder": sys.byteorder,
+        "pint": pint.__version__,
+        "source": source_hash(unit_defs_path),
+        "registry": registry_settings(ureg),
+        "contexts": [name for name, _ in contexts],
+    }
+    return writer.to_bytes(header)
+
+
+def load_compiled(
+    unit_defs_path: Path, settings: dict | None = None
+) -> CompiledDefinitions | None:
+    """Load compiled definitions of a unit definitions directory.
+
+    Parameters
+    ----------
+    unit_defs_path : Path
+        Path to the unit definitions directory.
+    settings : dict | None, optional
+        Settings of the registry to load the definitions into, as returned
+        by `registry_settings`. If None, the settings are not checked.
+
+    Returns
+    -------
+    CompiledDefinitions | None
+        The compiled definitions, or None if the file is missing, unreadable,
+        outdated compared to the text files, or compiled with a registry with
+        other settings.
+
+    """
+    fpath = unit_defs_path / "generated" / COMPILED_FILE
+    try:
+        header, columns = _read(fpath.read_bytes())
+    except (OSError, ValueError, KeyError):
+        return None
+    if (
+        header["format"] != COMPILED_FORMAT
+        or header["byteorder"] != sys.byteorder
+        or header["source"] != source_hash(unit_defs_path)
+        or (settings is not None and header["registry"] != settings)
+    ):
+        return None
+    return _build(header, columns)
+
+
+class _Writer:
+    """Collect definitions and cache of a registry as columns."""
+
+    def __init__(self):
+        self.strings = {}
+        self.containers = {}
+        self.columns = {name: array(code) for name, code in COLUMNS.items()}
+
+    def string(self, s: str | None) -> int:
+        if s is None:
+            return -1
+        if s not in self.strings:
+            self.strings[s] = len(self.strings)
+            end = self.columns["string_end"]
+            end.append((end[-1] if end else 0) + len(s))
+        return self.strings[s]
+
+    def container(self, units: UnitsContainer) -> int:
+        # Distinguish integer and float exponents, which compare equal, and
+        # sort units, as their order may depend on the iteration of sets.
+        key = tuple(
+            (name, exp, type(exp)) for name, exp in sorted(units.items())
+        )
+        if key not in self.containers:
+            self.containers[key] = len(self.containers)
+            for name, exponent, _ in key:
+                self.columns["container_name"].append(self.string(name))
+                self.number("container_exponent", exponent)
+            self.columns["container_end"].append(
+                len(self.columns["container_name"])
+            )
+        return self.containers[key]
+
+    def number(self, column: str, value):
+        if isinstance(value, int) and float(value) == value:
+            self.columns[column].append(float(value))
+            self.columns[f"{column}_int"].append(1)
+        elif isinstance(value, float):
+            self.columns[column].append(value)
+            self.columns[f"{column}_int"].append(0)
+        else:
+            raise ValueError(f"Cannot compile number: {value!r}")
+
+    def add_definition(self, group: int, definition):
+        if isinstance(definition, PrefixDefinition):
+            kind, scale, reference = _PREFIX, definition.value, -1
+        elif isinstance(definition, UnitDefinition) and isinstance(
+            definition.converter, ScaleConverter
+        ):
+            kind = _UNIT
+            scale = definition.converter.scale
+            reference = self.container(definition.reference)
+        else:
+            raise ValueError(f"Cannot compile definition: {definition}")
+        columns = self.columns
+        columns["definition_group"].append(group)
+        columns["definition_kind"].append(kind)
+        columns["definition_name"].append(self.string(definition.name))
+        columns["definition_symbol"].append(
+            self.string(definition.defined_symbol)
+        )
+        columns["definition_alias"].extend(
+            map(self.string, definition.aliases)
+        )
+        columns["definition_alias_end"].append(
+            len(columns["definition_alias"])
+        )
+        self.number("definition_scale", scale)
+        columns["definition_reference"].append(reference)
+
+    def add_cache(self, cache: RegistryCache):
+        # Sort entries, as their order depends on the iteration of sets.
+        columns = self.columns
+        root_units = {_word(k): v for k, v in cache.root_units.items()}
+        for name in sorted(root_units.keys() - {None}):
+            factor, units = root_units[name]
+            columns["root_name"].append(self.string(name))
+            self.number("root_factor", factor)
+            columns["root_units"].append(self.container(units))
+        dimensionality = {_word(k): v for k, v in cache.dimensionality.items()}
+        for name in sorted(dimensionality.keys() - {None}):
+            columns["dimensionality_name"].append(self.string(name))
+            columns["dimensionality_units"].append(
+                self.container(dimensionality[name])
+            )
+        for dims, names in sorted(
+            cache.dimensional_equivalents.items(),
+            key=lambda item: sorted(item[0].items()),
+        ):
+            columns["equivalents_dimensionality"].append(self.container(dims))
+            columns["equivalents_name"].extend(map(self.string, sorted(names)))
+            columns["equivalents_end"].append(len(columns["equivalents_name"]))
+
+    def to_bytes(self, header: dict) -> bytes:
+        self.columns["string_data"].frombytes("".join(self.strings).encode())
+        # Align columns to 8 bytes, so that they can be cast from the buffer.
+        data = bytearray()
+        header["columns"] = {}
+        for name, values in self.columns.items():
+            data.extend(bytes(-len(data) % 8))
+            header["columns"][name] = [len(data), len(values)]
+            data.extend(values.tobytes())
+        header_bytes = json.dumps(header).encode()
+        header_bytes += b" " * (-(len(header_bytes) + 12) % 8)
+        return (
+            COMPILED_MAGIC
+            + len(header_bytes).to_bytes(4, "little")
+            + header_bytes
+            + data
+        )
+
+
+def _word(key) -> str | None:
+    # Keys of the registry cache built from definitions are single units.
+    if len(key) != 1 or getattr(key, "scale", 1) != 1:
+        return None
+    ((name, exponent),) = key.items()
+    return name if exponent == 1 else None
+
+
+def _read(buffer: bytes) -> tuple[dict, dict]:
+    """Read header and columns from the contents of a compiled file.
+
+    Columns are returned as views cast from the contents, so that their
+    values are only converted to Python objects when they are used.
+    """
+    if buffer[: len(COMPILED_MAGIC)] != COMPILED_MAGIC:
+        raise ValueError("Not a compiled definitions file.")
+    start = len(COMPILED_MAGIC) + 4
+    size = int.from_bytes(buffer[len(COMPILED_MAGIC) : start], "little")
+    header = json.loads(buffer[start : start + size])
+    start += size
+    columns = {}
+    view = memoryview(buffer)
+    for name, code in COLUMNS.items():
+        offset, length = header["columns"][name]
+        offset += start
+        end = offset + length * array(code).itemsize
+        columns[name] = view[offset:end].cast(code)
+    return header, columns
+
+
+def _build(header: dict, columns: dict) -> CompiledDefinitions:
+    """Build definitions and registry cache from columns."""
+    data = bytes(columns["string_data"]).decode()
+    strings = []
+    start = 0
+    for end in columns["string_end"]:
+        strings.append(data[start:end])
+        start = end
+
+    containers = []
+    start = 0
+    for end in columns["container_end"]:
+        containers.append(
+            UnitsContainer(
+                {
+                    strings[columns["container_name"][i]]: _number(
+                        columns, "container_exponent", i
+                    )
+                    for i in range(start, end)
+                }
+            )
+        )
+        start = end
+
+    compiled = CompiledDefinitions(
+        contexts={name: [] for name in header["contexts"]}
+    )
+    groups = list(compiled.contexts.values())
+    start = 0
+    for i, end in enumerate(columns["definition_alias_end"]):
+        name = strings[columns["definition_name"][i]]
+        symbol = columns["definition_symbol"][i]
+        symbol = strings[symbol] if symbol >= 0 else None
+        aliases = tuple(
+            strings[j] for j in columns["definition_alias"][start:end]
+        )
+        start = end
+        scale = _number(columns, "definition_scale", i)
+        if columns["definition_kind"][i] == _PREFIX:
+            definition = PrefixDefinition(name, scale, symbol, aliases)
+        else:
+            definition = UnitDefinition(
+                name,
+                symbol,
+                aliases,
+                ScaleConverter(scale),
+                containers[columns["definition_reference"][i]],
+            )
+        group = columns["definition_group"][i]
+        if group < 0:
+            compiled.definitions.append(definition)
+        else:
+            groups[group].append(definition)
+    compiled.contexts = {
+        name: ContextDefinition(name, (), {}, (), tuple(redefinitions))
+        for name, redefinitions in compiled.contexts.items()
+    }
+
+    # The cache also covers pint's default definitions, so that it can only
+    # be used with the version of pint it was built with.
+    if header["pint"] != pint.__version__:
+        return compiled
+    cache = compiled.cache = RegistryCache()
+    for i, name in enumerate(columns["root_name"]):
+        cache.root_units[ParserHelper.from_word(strings[name])] = (
+            _number(columns, "root_factor", i),
+            containers[columns["root_units"][i]],
+        )
+    for name, units in zip(
+        columns["dimensionality_name"], columns["dimensionality_units"]
+    ):
+        cache.dimensionality[ParserHelper.from_word(strings[name])] = (
+            containers[units]
+        )
+    start = 0
+    for dimensionality, end in zip(
+        columns["equivalents_dimensionality"], columns["equivalents_end"]
+    ):
+        cache.dimensional_equivalents[containers[dimensionality]] = {
+            strings[j] for j in columns["equivalents_name"][start:end]
+        }
+        start = end
+    return compiled
+
+
+def _number(columns: dict, column: str, i: int):
+    value = columns[column][i]
+    return int(value) if columns[f"{column}_int"][i] else value
@@ -0,0 +1,115 @@
+"""Store and load snapshots of the fully set-up CET unit registry."""
+
+import os
+import pickle
+from dataclasses import dataclass, field
+from hashlib import sha256
+from importlib.metadata import PackageNotFoundError, version
+from pathlib import Path
+from tempfile import NamedTemporaryFile
+
+import pint
+
+# Version of the snapshot format. Increase when the contents change.
+SNAPSHOT_FORMAT = 3
+
+# Prefix and suffix of the names of snapshot files in the cache folder.
+SNAPSHOT_PREFIX = "registry-"
+SNAPSHOT_SUFFIX = ".pickle"
+
+
+@dataclass
+class RegistrySnapshot:
+    """Snapshot of the fully set-up CET unit registry.
+
+    Attributes
+    ----------
+    init_definitions : list
+        Definitions added when the registry was created (pint's default
+        definitions) in the order in which they were added.
+    setup_definitions : list
+        Definitions added when the CET unit definitions were set up in the
+        order in which they were added.
+    units : dict
+        Map of unit names to unit definitions including prefixed units that
+        were resolved during setup.
+    cache : pint.facets.plain.registry.RegistryCache
+        The registry cache built after all definitions were loaded.
+
+    """
+
+    init_definitions: list = field(default_factory=list)
+    setup_definitions: list = field(default_factory=list)
+    units: dict = field(default_factory=dict)
+    cache: object = None
+
+
+def _package_version() -> str:
+    try:
+        return version("cet-units")
+    except PackageNotFoundError:
+        return "unknown"
+
+
+def snapshot_key(unit_defs_path: Path) -> str:
+    """Compute the key identifying snapshots of a unit definitions directory.
+
+    The key is a hash of all files in the unit definitions directory as well
+    as of the versions of pint and cet_units and of the snapshot format.
+
+    Parameters
+    ----------
+    unit_defs_path : Path
+        Path to the unit definitions directory.
+
+    """
+    h = sha256(
+        f"{SNAPSHOT_FORMAT}|{pint.__version__}|{_package_version()}".encode()
+    )
+    for fpath in sorted(unit_defs_path.rglob("*")):
+        if not fpath.is_file():
+            continue
+        h.update(fpath.relative_to(unit_defs_path).as_posix().encode())
+        h.update(fpath.read_bytes())
+    return h.hexdigest()
+
+
+def snapshot_path(cache_folder: str | Path, key: str) -> Path:
+    """Return path of the snapshot file with a key in a cache folder."""
+    return Path(cache_folder) / f"{SNAPSHOT_PREFIX}{key}{SNAPSHOT_SUFFIX}"
+
+
+def load_snapshot(fpath: Path) -> RegistrySnapshot | None:
+    """Load snapshot from file, or return None if not found or unreadable."""
+    try:
+        with open(fpath, "rb") as file_handle:
+            snapshot = pickle.load(file_handle)
+    except Exception:
+        return None
+    if not isinstance(snapshot, RegistrySnapshot):
+        return None
+    return snapshot
+
+
+def save_snapshot(fpath: Path, snapshot: RegistrySnapshot):
+    """Save snapshot to file atomically, ignoring unwritable cache folders.
+
+    The cache folder is created readable and writable by the owner only, as
+    snapshots are unpickled when loaded. Snapshots with other keys in the
+    same folder are deleted, as they are stale once the definitions, pint or
+    cet_units changed.
+    """
+    try:
+        fpath.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        with NamedTemporaryFile(
+            dir=fpath.parent, prefix=".tmp-", delete=False
+        ) as file_handle:
+            pickle.dump(
+                snapshot, file_handle, protocol=pickle.HIGHEST_PROTOCOL
+            )
+        os.replace(file_handle.name, fpath)
+        for stale in fpath.parent.glob(f"{SNAPSHOT_PREFIX}*{SNAPSHOT_SUFFIX}"):
+            if stale != fpath:
+                stale.unlink(missing_ok=True)
+    except OSError:
+        pass
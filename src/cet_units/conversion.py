@@ -0,0 +1,139 @@
+"""Convert values of long-format tables with per-row units."""
+
+from typing import TYPE_CHECKING
+
+from pint import PintError
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+    from .registry import CETUnitRegistry
+
+
+def convert_table(
+    data: "pd.DataFrame",
+    to: str | None = None,
+    *,
+    to_col: str | None = None,
+    value_col: str = "value",
+    unit_col: str = "unit",
+    context: str | None = None,
+    context_col: str | None = None,
+    ureg: "CETUnitRegistry | None" = None,
+) -> tuple["pd.DataFrame", "pd.Series"]:
+    """Convert values of a long-format table to target units.
+
+    Rows are grouped by their unique combinations of units, target units and
+    context. The conversion factor of each combination is resolved once and
+    all values are then converted in a single vectorized multiplication, so
+    the cost of resolving conversions scales with the number of distinct
+    units rather than with the number of rows. Conversions that are not
+    plain multiplications, e.g. between temperature scales, are applied to
+    the values of each combination at once.
+
+    Parameters
+    ----------
+    data : pd.DataFrame
+        Table with a value column and a unit column.
+    to : str | None, optional
+        Target units of all rows. Either this or `to_col` must be provided.
+    to_col : str | None, optional
+        Column containing the target units of each row.
+    value_col : str, optional
+        Column containing the values (default: `"value"`).
+    unit_col : str, optional
+        Column containing the units (default: `"unit"`).
+    context : str | None, optional
+        Context to convert all rows in, e.g. `"AR6GWP100"`.
+    context_col : str | None, optional
+        Column containing the context of each row. Empty entries convert
+        without context.
+    ureg : CETUnitRegistry | None, optional
+        Registry to use. Defaults to the registry of this package.
+
+    Returns
+    -------
+    tuple[pd.DataFrame, pd.Series]
+        Copy of the table with converted values and target units, and a
+        boolean mask of rows that could not be converted, e.g. because of
+        unknown units or incompatible dimensions. These rows keep their
+        original values and units. Values converted by NaN factors, e.g. of
+        species without metric in an assessment, are NaN and not reported.
+
+    """
+    import pandas as pd
+
+    if (to is None) == (to_col is None):
+        raise ValueError("Exactly one of `to` and `to_col` must be provided.")
+    if context is not None and context_col is not None:
+        raise ValueError(
+            "At most one of `context` and `context_col` may be provided."
+        )
+    if ureg is None:
+        from . import ureg
+
+    # Combine units, target units and contexts of all rows into one code per
+    # row by factorizing each column separately.
+    columns = [
+        data[unit_col],
+        data[to_col] if to_col is not None else pd.Series([to]),
+        data[context_col] if context_col is not None else pd.Series([context]),
+    ]
+    codes = 0
+    uniques = []
+    for column in columns:
+        column_codes, column_uniques = pd.factorize(
+            column, use_na_sentinel=False
+        )
+        codes = codes * len(column_uniques) + column_codes
+        uniques.append(column_uniques)
+    codes, combined = pd.factorize(codes)
+
+    # Resolve conversion factor of each unique combination once. Factors may
+    # be NaN, e.g. for species without metric in an assessment.
+    factors = []
+    failed = []
+    others = {}
+    for i, code in enumerate(combined):
+        code, i_context = divmod(int(code), len(uniques[2]))
+        i_unit, i_to = divmod(code, len(uniques[1]))
+        unit, unit_to = uniques[0][i_unit], uniques[1][i_to]
+        ctx = uniques[2][i_context]
+        contexts = (ctx,) if isinstance(ctx, str) and ctx else ()
+        factors.append(1.0)
+        failed.append(False)
+        if not (isinstance(unit, str) and isinstance(unit_to, str)):
+            failed[i] = True
+            continue
+        try:
+            factors[i] = ureg.converter(unit, unit_to, contexts).factor
+        except (PintError, KeyError):
+            failed[i] = True
+        except ValueError:
+            # Conversions that are not plain multiplications, e.g. between
+            # temperature scales, are applied to the values of their rows.
+            others[i] = (unit, unit_to, contexts)
+    factors = pd.Series(factors, dtype=float).to_numpy()[codes]
+    failed = pd.Series(failed, dtype=bool).to_numpy()[codes]
+
+    # Convert all rows at once, and rows of other conversions per group.
+    values = data[value_col] * factors
+    for i, (unit, unit_to, contexts) in others.items():
+        rows = codes == i
+        try:
+            values[rows] = (
+                ureg.Quantity(data[value_col].to_numpy()[rows], unit)
+                .to(unit_to, *contexts)
+                .magnitude
+            )
+        except (PintError, ValueError, KeyError):
+            failed[rows] = True
+
+    # Keep rows that could not be converted.
+    errors = pd.Series(failed, index=data.index)
+    result = data.copy()
+    result[value_col] = data[value_col].where(errors, values)
+    result[unit_col] = data[unit_col].where(
+        errors, data[to_col] if to_col is not None else to
+    )
+    return result, errors
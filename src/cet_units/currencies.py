@@ -0,0 +1,139 @@
+"""Convert values between currencies and price-base years."""
+
+from dataclasses import dataclass
+from re import compile as re_compile
+from re import escape
+from typing import TYPE_CHECKING
+
+from pint.util import UnitsContainer
+
+if TYPE_CHECKING:
+    import numpy as np
+
+    from .registry import CETUnitRegistry
+
+
+@dataclass(frozen=True)
+class CurrencyTable:
+    """Table of values of currencies in price-base years.
+
+    Attributes
+    ----------
+    currencies : list[str]
+        Names of currencies (rows of the table), e.g. `"EUR"`.
+    years : np.ndarray
+        Consecutive price-base years (columns of the table).
+    factors : np.ndarray
+        Value of one unit of each currency in each year in units of the
+        reference, with NaN where a currency is not defined for a year. This
+        combines deflators (along rows) and exchange rates (across rows).
+    reference : str
+        Name of the unit that factors are expressed in, e.g. `"USD_2024"`.
+
+    """
+
+    currencies: list[str]
+    years: "np.ndarray"
+    factors: "np.ndarray"
+    reference: str
+
+    @classmethod
+    def from_registry(cls, ureg: "CETUnitRegistry") -> "CurrencyTable":
+        """Compute table from the currency units of a registry.
+
+        Parameters
+        ----------
+        ureg : CETUnitRegistry
+            Registry to compute the table from.
+
+        """
+        import numpy as np
+
+        # Find units of all currencies and years, e.g. `EUR_2020`, and define
+        # those not used yet.
+        currencies = list(ureg.currencies)
+        pattern = re_compile(
+            rf"({'|'.join(map(escape, currencies))})_(\d{{4}})"
+        )
+        ureg._define_currency_units(ureg._currency_defs)
+        units = {
+            (m.group(1), int(m.group(2))): name
+            for name in ureg._units.maps[-1]
+            if (m := pattern.fullmatch(name))
+        }
+        years = np.arange(
+            min(year for _, year in units), max(year for _, year in units) + 1
+        )
+
+        # Compute value of each unit in units of the reference.
+        factors = np.full((len(currencies), len(years)), np.nan)
+        reference = None
+        for (currency, year), name in units.items():
+            factor, root = ureg._get_root_units(UnitsContainer({name: 1}))
+            factors[currencies.index(currency), year - years[0]] = factor
+            reference = str(root)
+        factors.flags.writeable = False
+        years.flags.writeable = False
+
+        return cls(currencies, years, factors, reference)
+
+    def lookup(self, currencies, years) -> "np.ndarray":
+        """Look up values of currencies in years in units of the reference.
+
+        Parameters
+        ----------
+        currencies : array-like
+            Names of currencies, e.g. `"EUR"`.
+        years : array-like
+            Price-base years, broadcastable against `currencies`.
+
+        Returns
+        -------
+        np.ndarray
+            Values of the currencies in the years, with NaN where a currency
+            is not defined for a year.
+
+        """
+        import numpy as np
+
+        # Compare with each currency in turn, as there are only a few.
+        currencies = np.asarray(currencies)
+        rows = np.full(currencies.shape, -1)
+        for i, currency in enumerate(self.currencies):
+            rows[currencies == currency] = i
+        if (rows < 0).any():
+            unknown = np.unique(currencies[rows < 0]).astype(str)
+            raise ValueError(f"Unknown currencies: {', '.join(unknown)}")
+
+        cols = np.asarray(years, dtype=float) - self.years[0]
+        valid = np.isfinite(cols) & (cols >= 0) & (cols < len(self.years))
+        cols = np.where(valid, cols, 0).astype(int)
+        return np.where(valid, self.factors[rows, cols], np.nan)
+
+    def convert(self, values, currencies, years, currency: str, year: int):
+        """Convert values from currencies and years to a currency and year.
+
+        Parameters
+        ----------
+        values : array-like
+            Values to convert, e.g. a NumPy array or a pandas Series.
+        currencies : array-like
+            Names of the currencies of the values, e.g. `"EUR"`.
+        years : array-like
+            Price-base years of the values.
+        currency : str
+            Name of the currency to convert to.
+        year : int
+            Price-base year to convert to.
+
+        Returns
+        -------
+        array-like
+            Converted values, with NaN where a currency is not defined for a
+            year.
+
+        """
+        factor_to = self.lookup(currency, year)
+        if factor_to != factor_to:
+            raise ValueError(f"Undefined currency and year: {currency}_{year}")
+        return values * (self.lookup(currencies, years) / factor_to)
@@ -0,0 +1,111 @@
+"""Aggregate greenhouse-gas emissions with metrics of assessment reports."""
+
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+from pint.util import UnitsContainer
+
+if TYPE_CHECKING:
+    import numpy as np
+
+    from .registry import CETUnitRegistry
+
+
+@dataclass(frozen=True)
+class GWPMatrix:
+    """Matrix of emission metrics of species in assessment contexts.
+
+    Attributes
+    ----------
+    species : list[str]
+        Names of species (rows of the matrix), i.e. CO2 followed by the
+        species of the registry.
+    assessments : list[str]
+        Names of assessment contexts (columns of the matrix), e.g.
+        `"AR6GWP100"`.
+    factors : np.ndarray
+        Factors converting masses of species into masses of CO2eq, with
+        NaN where a species has no metric in an assessment.
+
+    """
+
+    species: list[str]
+    assessments: list[str]
+    factors: "np.ndarray"
+
+    @classmethod
+    def from_registry(cls, ureg: "CETUnitRegistry") -> "GWPMatrix":
+        """Compute matrix from the assessment contexts of a registry.
+
+        Parameters
+        ----------
+        ureg : CETUnitRegistry
+            Registry to compute the matrix from.
+
+        """
+        import numpy as np
+
+        species = ["CO2", *(s for s in ureg.species if s != "CO2")]
+        assessments = list(ureg.assessments)
+        factors = np.full((len(species), len(assessments)), np.nan)
+
+        # Convert one gram of each species within each context in turn, so
+        # that each context is activated only once.
+        units_from = [UnitsContainer({f"gram__{s}": 1}) for s in species]
+        unit_to = UnitsContainer({"gram__CO2eq": 1})
+        for j, assessment in enumerate(assessments):
+            with ureg.context(assessment):
+                for i, unit_from in enumerate(units_from):
+                    factors[i, j] = ureg.convert(1.0, unit_from, unit_to)
+        factors.flags.writeable = False
+
+        return cls(species, assessments, factors)
+
+    def aggregate(
+        self,
+        masses,
+        species,
+        assessment: str | None = None,
+    ):
+        """Aggregate masses of species to total masses of CO2eq.
+
+        Parameters
+        ----------
+        masses : array-like
+            Masses of emissions, all in the same units (e.g. tonnes).
+        species : array-like
+            Names of the species of the emissions, e.g. `"CH4"`.
+        assessment : str | None, optional
+            Name of the assessment context to aggregate with. If None
+            (default), totals are returned for all assessments.
+
+        Returns
+        -------
+        float | np.ndarray
+            Total mass of CO2eq in the units of the masses, or an array of
+            totals for all assessments ordered as `assessments`. Totals are
+            NaN if any species has no metric in an assessment.
+
+        """
+        import numpy as np
+
+        # Sum masses per species first, so that the metrics only need to be
+        # applied once per species rather than once per emission.
+        labels, inverse = np.unique(np.asarray(species), return_inverse=True)
+        masses = np.bincount(
+            inverse.ravel(),
+            weights=np.asarray(masses, dtype=float).ravel(),
+            minlength=len(labels),
+        )
+        rows = {s: i for i, s in enumerate(self.species)}
+        unknown = [str(s) for s in labels if s not in rows]
+        if unknown:
+            raise ValueError(f"Unknown species: {', '.join(unknown)}")
+        index = [rows[s] for s in labels]
+
+        if assessment is None:
+            return masses @ self.factors[index]
+        if assessment not in self.assessments:
+            raise ValueError(f"Unknown assessment: {assessment}")
+        j = self.assessments.index(assessment)
+        return masses @ self.factors[index, j]
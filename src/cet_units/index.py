@@ -0,0 +1,102 @@
+"""Index units of flows, currencies and species for discovery queries."""
+
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from typing import NamedTuple
+
+
+class FlowUnit(NamedTuple):
+    """Unit of a flow in the index.
+
+    Attributes
+    ----------
+    name : str
+        Name of the unit, e.g. `"watt_hour_H2_LHV"`.
+    flow : str
+        ID of the flow, e.g. `"H2"`.
+    variant : str
+        Variant of the unit, e.g. `"LHV"`, or `""` for units without variant.
+    dimension : str
+        Physical dimension of the unit, e.g. `"energy"`.
+    compatible : tuple
+        Key shared by the units that can be converted into each other.
+
+    """
+
+    name: str
+    flow: str
+    variant: str
+    dimension: str
+    compatible: tuple
+
+
+@dataclass
+class UnitIndex:
+    """Index of the units of flows, currencies and species of a registry.
+
+    The index is maintained by `CETUnitRegistry` as flows are defined, so
+    that discovering and validating units does not require searching the
+    registry.
+
+    Attributes
+    ----------
+    flows : dict[str, dict[str, dict[str, list[str]]]]
+        Names of units by flow, variant and dimension.
+    units : dict[str, FlowUnit]
+        Flow units by name, symbol and alias.
+    compatible : dict[tuple, list[str]]
+        Names of units that can be converted into each other by key.
+    currencies : dict[str, list[int]]
+        Price-base years available for each currency.
+    species : dict[str, list[str]] | None
+        Names of assessment contexts defining a metric for each species, or
+        None if not indexed yet.
+
+    """
+
+    flows: dict = field(default_factory=dict)
+    units: dict = field(default_factory=dict)
+    compatible: dict = field(default_factory=dict)
+    currencies: dict = field(default_factory=dict)
+    species: dict | None = None
+
+    def add_flow(
+        self,
+        flow_id: str,
+        units: Iterable[tuple[FlowUnit, Iterable[str]]],
+    ):
+        """Add units of a flow, replacing those added for it before.
+
+        Parameters
+        ----------
+        flow_id : str
+            ID of the flow.
+        units : Iterable[tuple[FlowUnit, Iterable[str]]]
+            Units of the flow with their symbols and aliases.
+
+        """
+        self.remove_flow(flow_id)
+        variants = self.flows[flow_id] = {}
+        for unit, names in units:
+            variants.setdefault(unit.variant, {}).setdefault(
+                unit.dimension, []
+            ).append(unit.name)
+            self.compatible.setdefault(unit.compatible, []).append(unit.name)
+            self.units[unit.name] = unit
+            for name in names:
+                self.units[name] = unit
+
+    def remove_flow(self, flow_id: str):
+        """Remove units of a flow, if added before.
+
+        Parameters
+        ----------
+        flow_id : str
+            ID of the flow.
+
+        """
+        if self.flows.pop(flow_id, None) is None:
+            return
+        for name in [n for n, u in self.units.items() if u.flow == flow_id]:
+            unit = self.units.pop(name)
+            self.compatible.pop(unit.compatible, None)
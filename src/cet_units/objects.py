@@ -0,0 +1,114 @@
+"""Define objects of the CET unit registry."""
+
+from dataclasses import dataclass
+
+from pint import Quantity, Unit
+from pint.compat import is_duck_array_type
+
+
+class CETQuantity(Quantity):
+    """Quantity of the CET unit registry.
+
+    This is a subclass of `pint`'s default `Quantity`. Conversions of its
+    magnitude go through the conversion-factor cache of the registry.
+    Quantities are pickled with a reference to their registry rather than
+    to the application registry, see `CETUnitRegistry.__reduce__`.
+    """
+
+    def __reduce__(self):  # noqa: D105
+        if self._REGISTRY._unit_defs_path is None:
+            return super().__reduce__()
+        # Magnitudes are pickled as they are, so that NumPy arrays can be
+        # pickled out-of-band with protocol 5.
+        return _unpickle_quantity, (
+            self._REGISTRY,
+            self._magnitude,
+            self._units,
+        )
+
+    def _convert_magnitude_not_inplace(self, other, *contexts, **ctx_kwargs):
+        return self._REGISTRY._convert_cached(
+            self._magnitude, self._units, other, contexts, ctx_kwargs
+        )
+
+    def _convert_magnitude(self, other, *contexts, **ctx_kwargs):
+        return self._REGISTRY._convert_cached(
+            self._magnitude,
+            self._units,
+            other,
+            contexts,
+            ctx_kwargs,
+            inplace=(
+                not contexts and is_duck_array_type(type(self._magnitude))
+            ),
+        )
+
+
+class CETUnit(Unit):
+    """Unit of the CET unit registry.
+
+    This is a subclass of `pint`'s default `Unit`, which is pickled with a
+    reference to its registry like `CETQuantity`.
+    """
+
+    def __reduce__(self):  # noqa: D105
+        if self._REGISTRY._unit_defs_path is None:
+            return super().__reduce__()
+        return _unpickle_unit, (self._REGISTRY, self._units)
+
+
+def _unpickle_quantity(registry, magnitude, units) -> CETQuantity:
+    _define_units(registry, units)
+    return registry.Quantity(magnitude, units)
+
+
+def _unpickle_unit(registry, units) -> CETUnit:
+    _define_units(registry, units)
+    return registry.Unit(units)
+
+
+def _define_units(registry, units):
+    # Resolve names not resolved yet, so that units of stored flows are
+    # defined on demand.
+    for name in units:
+        if name not in registry._units:
+            registry.get_name(name)
+
+
+@dataclass(frozen=True, slots=True)
+class Converter:
+    """Converter applying a fixed conversion to plain numbers.
+
+    Converters are created via `CETUnitRegistry.converter`. They hold no
+    reference to the registry, so they are cheap to call and can be pickled,
+    e.g. to be sent to multiprocessing workers.
+
+    Attributes
+    ----------
+    src : str
+        Units converted from.
+    dst : str
+        Units converted to.
+    contexts : tuple[str, ...]
+        Names of the contexts the conversion was resolved in.
+    factor : float
+        Factor by which values are multiplied.
+
+    """
+
+    src: str
+    dst: str
+    contexts: tuple[str, ...]
+    factor: float
+
+    def __call__(self, values):
+        """Convert values.
+
+        Parameters
+        ----------
+        values :
+            A float, a NumPy array, a pandas Series or any other object
+            supporting multiplication with a float.
+
+        """
+        return values * self.factor
@@ -1,9 +1,89 @@
 """Define CET unit registry."""
 
+from collections import ChainMap
+from collections.abc import Callable, Iterable
+from dataclasses import replace
+from decimal import Decimal
+from fractions import Fraction
+from functools import lru_cache, partial, wraps
+from itertools import count
+from math import isnan
+from os import getpid
 from pathlib import Path
-from re import sub
+from re import compile as re_compile
+from re import escape
+from weakref import WeakValueDictionary
 
-from pint import UnitRegistry
+from pint import UndefinedUnitError, Unit, UnitRegistry
+from pint.delegates.formatter._format_helpers import join_mu
+from pint.delegates.formatter._spec_helpers import split_format
+from pint.delegates.formatter.html import HTMLFormatter
+from pint.delegates.formatter.latex import LatexFormatter
+from pint.delegates.formatter.plain import (
+    CompactFormatter,
+    DefaultFormatter,
+    PrettyFormatter,
+    RawFormatter,
+)
+from pint.facets.context.definitions import ContextDefinition
+from pint.facets.context.objects import ContextChain
+from pint.facets.context.registry import ContextCacheOverlay
+from pint.facets.plain.definitions import ScaleConverter, UnitDefinition
+from pint.util import UnitsContainer, iterable
+from platformdirs import user_cache_path
+
+from ._compiled import (
+    CompiledDefinitions,
+    load_compiled,
+    registry_settings,
+)
+from .currencies import CurrencyTable
+from .emissions import GWPMatrix
+from .index import FlowUnit, UnitIndex
+from .objects import CETQuantity, CETUnit, Converter
+from .stats import RegistryStats
+from ._snapshot import (
+    RegistrySnapshot,
+    load_snapshot,
+    save_snapshot,
+    snapshot_key,
+    snapshot_path,
+)
+
+# Maximum number of unit strings memoized by the species rewriting.
+SPECIES_CACHE_SIZE = 4096
+
+# Maximum number of conversion factors memoized by the registry.
+CONVERSION_CACHE_SIZE = 1024
+
+# Maximum number of formatted units memoized by the registry.
+FORMAT_CACHE_SIZE = 1024
+
+# Methods shadowed by instrumented instance attributes while stats are
+# enabled.
+STATS_METHODS = (
+    "parse_units_as_container",
+    "parse_expression",
+    "_convert_cached",
+    "enable_contexts",
+    "define",
+    "define_many",
+    "load_definitions",
+    "_build_cache",
+    "_update_cache",
+)
+
+# Formatters of pint for which the units of quantities with scalar
+# magnitudes can be formatted separately, with the strings joining magnitude
+# and units.
+FORMAT_JOINTS = {
+    CompactFormatter: "{} {}",
+    DefaultFormatter: "{} {}",
+    HTMLFormatter: "{} {}",
+    LatexFormatter: r"{}\ {}",
+    PrettyFormatter: "{} {}",
+    RawFormatter: "{} {}",
+}
 
 # Define unit variants to be defined for each flow.
 FLOW_UNIT_VARIANTS = {
@@ -62,13 +142,80 @@ class CETUnitRegistry(UnitRegistry):
         List of greenhouse-gas emission species for which separate units are
         defined.
     currencies : list[str]
-        List of currencies for which separate units are defined.
+        List of currencies for which separate units are defined. Units of
+        currencies in price-base years, e.g. `EUR_2020`, are only defined
+        once first parsed, except for the base units of currencies.
+    contexts : list[str]
+        List of names of all available contexts, including the assessment
+        contexts that are only loaded once they are first used.
+    assessments : list[str]
+        List of names of the assessment contexts defining emission metrics,
+        e.g. `AR6GWP100`.
+    stored_flows : list[str]
+        List of flows for which stored definitions are available.
+    flows_on_demand : bool
+        If True (default), the stored definitions of a flow are loaded when
+        a unit of that flow is first parsed, e.g. `kg_H2` or `MWh_NG_LHV`, so
+        that calling `define_flows` beforehand is not required.
+    frozen : bool
+        True once the registry has been frozen via `freeze`, after which it
+        can be shared by threads converting concurrently.
 
     """
 
+    flows_on_demand: bool = True
+
+    Quantity = CETQuantity
+    Unit = CETUnit
+
     _unit_defs_path: Path | None = None
     _species: list[str] = []
     _currencies: list[str] = []
+    _currency_defs: dict[str, str] = {}
+    _currency_unit_pattern = None
+    _species_pre = _species_post = str
+    _lazy_contexts: dict[str, Path] = {}
+    _compiled_contexts: dict = {}
+    _context_tables: dict[str, dict] = {}
+    _assessments: list[str] = []
+    _gwp_matrix: GWPMatrix | None = None
+    _unit_index: UnitIndex | None = None
+    _flow_dimensions: dict[str, str] | None = None
+    _currency_table: CurrencyTable | None = None
+    _flows: set[str] = set()
+    _flow_specs: dict[str, dict] = {}
+    _stored_flows: list[str] = []
+    _flow_unit_pattern = None
+    _flow_units_cache: dict | None = None
+    _definitions_log: list | None = None
+    _init_definitions: list | None = None
+    _setup_definitions: list | None = None
+    _stats: RegistryStats | None = None
+    _stats_restore: dict | None = None
+    _format_quantity_full = None
+    _frozen: bool = False
+    _snapshot_key: str | None = None
+    _pickle_id: int | None = None
+
+    def __init__(self, *args, **kwargs):
+        """Create registry. Arguments are passed on to `UnitRegistry`."""
+        # Keep track of definitions added during setup for snapshots.
+        self._definitions_log = []
+
+        # Memoize multiplicative conversion factors.
+        self._conversion_factor_cached = lru_cache(
+            maxsize=CONVERSION_CACHE_SIZE
+        )(self._conversion_factor)
+
+        # Memoize formatted units of quantities.
+        self._format_units_cached = lru_cache(maxsize=FORMAT_CACHE_SIZE)(
+            self._format_units
+        )
+
+        # Index units of flows, currencies and species for queries.
+        self._unit_index = UnitIndex()
+
+        super().__init__(*args, **kwargs)
 
     @property
     def species(self) -> list[str]:  # noqa: D102
@@ -78,21 +225,183 @@ class CETUnitRegistry(UnitRegistry):
     def currencies(self) -> list[str]:  # noqa: D102
         return self._currencies
 
-    def _setup_cet_defs(self, unit_defs_path: Path):
-        """Set up unit definitions from unit definition files."""
+    @property
+    def contexts(self) -> list[str]:  # noqa: D102
+        return sorted(set(self._contexts) | set(self._lazy_contexts))
+
+    @property
+    def assessments(self) -> list[str]:  # noqa: D102
+        return self._assessments
+
+    @property
+    def stored_flows(self) -> list[str]:  # noqa: D102
+        return self._stored_flows
+
+    @property
+    def frozen(self) -> bool:  # noqa: D102
+        return self._frozen
+
+    @classmethod
+    def from_unit_defs(
+        cls,
+        unit_defs_path: Path,
+        cache_folder: str | Path | None = None,
+    ) -> "CETUnitRegistry":
+        """Create registry and set up definitions from unit definition files.
+
+        If a cache folder is provided, a snapshot of the fully set-up registry
+        is stored in it and loaded instead of parsing the definition files
+        again. Snapshots are keyed on the contents of the unit definitions
+        directory and on the versions of pint and cet_units. As they are
+        pickles, the cache folder must not be writable by other users.
+
+        Parameters
+        ----------
+        unit_defs_path : Path
+            Path to the unit definitions directory.
+        cache_folder : str | Path | None, optional
+            Folder in which snapshots are saved and loaded from. Use ":auto:"
+            for the default user cache folder. If None or empty, snapshots are
+            disabled (default).
+
+        """
+        if cache_folder == ":auto:":
+            cache_folder = user_cache_path(
+                appname="cet_units", appauthor=False
+            )
+        if not cache_folder:
+            ureg = cls()
+            ureg._setup_cet_defs(unit_defs_path)
+            return ureg
+
+        key = snapshot_key(unit_defs_path)
+        fpath = snapshot_path(cache_folder, key)
+        snapshot = load_snapshot(fpath)
+        if snapshot is not None:
+            ureg = cls(filename=snapshot)
+            ureg._setup_cet_defs(unit_defs_path, snapshot)
+            ureg._snapshot_key = key
+            return ureg
+
+        ureg = cls()
+        ureg._setup_cet_defs(unit_defs_path)
+        ureg._snapshot_key = key
+        snapshot = RegistrySnapshot(
+            init_definitions=ureg._init_definitions,
+            setup_definitions=ureg._setup_definitions,
+            units=dict(ureg._units.maps[-1]),
+            cache=ureg._cache,
+        )
+        save_snapshot(fpath, snapshot)
+        return ureg
+
+    def _setup_cet_defs(
+        self,
+        unit_defs_path: Path,
+        snapshot: RegistrySnapshot | None = None,
+        use_compiled: bool = True,
+    ):
+        """Set up unit definitions from unit definition files.
+
+        If a snapshot is provided, the registry must have been created from it
+        and the definition files are not parsed again. Otherwise, compiled
+        definitions are used instead of the definition files if they are up
+        to date and were compiled with a registry with the same settings
+        (e.g. `non_int_type`), unless disabled via `use_compiled`.
+        """
         # Store path to unit definitions directory in registry object.
         self._unit_defs_path = unit_defs_path
 
+        # Keep track of definitions added during setup separately.
+        self._init_definitions = self._definitions_log
+        self._definitions_log = []
+
         # Load list of species.
         self._species = ["CO2eq", "CO2_eq", "CO2e", "C", "Ce"]
         fpath = unit_defs_path / "generated" / "emissions" / "species.txt"
         with open(fpath) as file_handle_species:
             self._species.extend(file_handle_species.read().splitlines())
+        self._compile_species()
 
         # Load list of currencies.
         fpath = unit_defs_path / "generated" / "currencies" / "currencies.txt"
         with open(fpath) as file_handle_currencies:
-            self._currencies.extend(file_handle_currencies.read().splitlines())
+            self._currencies = file_handle_currencies.read().splitlines()
+
+        # Collect definitions of currency units by name without parsing them,
+        # so that units of currencies in years can be defined once first
+        # used. Base units are defined during setup.
+        self._currency_defs = {}
+        currency_base_defs = []
+        currency_names = []
+        for p in sorted(fpath.parent.glob("*.txt")):
+            if p == fpath:
+                continue
+            with open(p) as file_handle_currency:
+                for line in file_handle_currency.read().splitlines():
+                    name, sep, reference = line.partition("=")
+                    if not sep or line.lstrip().startswith("#"):
+                        continue
+                    if reference.strip().startswith("["):
+                        currency_base_defs.append(line)
+                    else:
+                        self._currency_defs[name.strip()] = line
+                    currency_names.append(name.strip())
+        self._currency_unit_pattern = re_compile(
+            rf"(?:{'|'.join(map(escape, self._currencies))})_\d{{4}}$"
+        )
+
+        # Index years of currencies.
+        pattern = re_compile(
+            rf"({'|'.join(map(escape, self._currencies))})_(\d{{4}})"
+        )
+        currency_years = {currency: [] for currency in self._currencies}
+        for name in currency_names:
+            if match := pattern.fullmatch(name):
+                currency_years[match.group(1)].append(int(match.group(2)))
+        self._unit_index.currencies = {
+            currency: sorted(years)
+            for currency, years in currency_years.items()
+        }
+
+        # Load generic emissions definitions. The assessment contexts imported
+        # by them are only registered here and loaded once first used.
+        fpath = unit_defs_path / "generated" / "emissions" / "generic.txt"
+        with open(fpath) as file_handle_generic:
+            generic_defs = []
+            self._lazy_contexts = {}
+            self._context_tables = {}
+            self._assessments = []
+            for line in file_handle_generic.read().splitlines():
+                if line.startswith("@import "):
+                    p = fpath.parent / line.removeprefix("@import ").strip()
+                    self._lazy_contexts[p.stem] = p
+                    self._assessments.append(p.stem)
+                else:
+                    generic_defs.append(line)
+
+        # Compile pattern for detecting units of stored flows, which can then
+        # be loaded on demand.
+        self._flows = set()
+        self._flow_specs = {}
+        self._stored_flows = sorted(
+            p.stem
+            for p in (unit_defs_path / "generated" / "flows").glob("*.txt")
+        )
+        stored_flows = sorted(self._stored_flows, key=len, reverse=True)
+        variants = sorted(
+            {
+                var
+                for variants in FLOW_UNIT_VARIANTS.values()
+                for var in variants
+            },
+            key=len,
+            reverse=True,
+        )
+        self._flow_unit_pattern = re_compile(
+            rf"[^_]_({'|'.join(map(escape, stored_flows))})"
+            rf"(?:_(?:{'|'.join(map(escape, variants))}))?$"
+        )
 
         # Add preprocessing to registry.
         self.preprocessors.insert(len(self.preprocessors), self._preprocess)
@@ -101,40 +410,779 @@ class CETUnitRegistry(UnitRegistry):
         self.formatter.default_format = "~P"
 
         # Add postprocessing to registry.
-        format_orig = self.formatter.format_quantity
-        self.formatter.format_quantity = lambda text, spec="": (
-            self._postprocess(format_orig(text, spec))
-        )
+        self._format_quantity_full = self.formatter.format_quantity
+        self.formatter.format_quantity = self._format_quantity
 
         # kt should be kilo metric tonnes, not knots.
         self._units.pop("kt", None)
         self._units_casei.pop("kt", None)
 
-        # Load units definitions from files.
-        self._on_redefinition = "ignore"  # No warning for redefining "year".
-        self.load_definitions(unit_defs_path / "plain.txt")
-        self._on_redefinition = "warn"
-        self.load_definitions(
-            unit_defs_path / "generated" / "emissions" / "generic.txt"
+        # Load units definitions from snapshot, from compiled definitions or
+        # from files. Compiled contexts are also used with snapshots.
+        compiled = (
+            load_compiled(unit_defs_path, registry_settings(self))
+            if use_compiled
+            else None
+        )
+        self._compiled_contexts = (
+            compiled.contexts if compiled is not None else {}
         )
-        for p in (unit_defs_path / "generated" / "currencies").glob("*.txt"):
-            if p.stem == "currencies":
+        if snapshot is not None:
+            self._replay_definitions(snapshot.setup_definitions)
+            self._units.maps[-1].update(snapshot.units)
+        elif compiled is not None:
+            self._replay_definitions(compiled.definitions)
+            self._build_cache(compiled)
+        else:
+            self._on_redefinition = "ignore"  # No warning for redefining year.
+            self.load_definitions(unit_defs_path / "plain.txt")
+            self._on_redefinition = "warn"
+            self.load_definitions(generic_defs)
+            self.load_definitions(currency_base_defs)
+
+            # Rebuild cache, so that it also covers the units loaded above.
+            self._build_cache()
+
+        # Stop keeping track of definitions once setup is complete.
+        self._setup_definitions = self._definitions_log
+        self._definitions_log = None
+
+    def __reduce__(self):  # noqa: D105
+        # Pickle a reference to the registry itself, which is used when
+        # unpickling in the same process, and to the unit definitions and the
+        # flows defined at runtime, from which the registry is set up once
+        # per process otherwise.
+        if self._pickle_id is None:
+            self._pickle_id = next(_pickle_ids)
+            _pickled_registries[self._pickle_id] = self
+        return _unpickle_registry, (
+            self._fingerprint(),
+            self._flow_specs,
+            (getpid(), self._pickle_id),
+        )
+
+    def _fingerprint(self) -> tuple[str, str]:
+        """Return path and key of the unit definitions of the registry.
+
+        Registries with the same key are interchangeable when unpickling in
+        another process, wherever their unit definitions are stored, so the
+        first registry pickled in a process is also used there for objects
+        pickled in other processes. The path is only used for setting up a
+        registry if no registry with the key exists.
+        """
+        if self._unit_defs_path is None:
+            raise TypeError(
+                "Only registries set up from unit definitions can be pickled."
+            )
+        if self._snapshot_key is None:
+            self._snapshot_key = snapshot_key(self._unit_defs_path)
+        _registries.setdefault(self._snapshot_key, self)
+        return str(self._unit_defs_path), self._snapshot_key
+
+    def load_definitions(self, file, is_resource: bool = False):
+        """Add units and prefixes defined in a definition file or snapshot.
+
+        Parameters
+        ----------
+        file :
+            Can be a filename, a line iterable, or a `RegistrySnapshot` (in
+            which case its definitions from registry creation are added).
+        is_resource : bool, optional
+            Used to indicate that the file is a resource file and therefore
+            should be loaded from the package.
+
+        """
+        self._check_not_frozen()
+        self._clear_caches()
+        if not isinstance(file, RegistrySnapshot):
+            return super().load_definitions(file, is_resource)
+
+        self._replay_definitions(file.init_definitions)
+        return file
+
+    def define(self, definition):
+        """Add unit to the registry.
+
+        Parameters
+        ----------
+        definition : str or Definition
+            A dimension, unit or prefix definition.
+
+        """
+        # Definitions added while contexts are active are redefinitions of
+        # the contexts, which do not change any cached conversion factors.
+        self._check_not_frozen()
+        if not self._active_ctx.contexts:
+            self._clear_caches()
+        super().define(definition)
+
+    def define_many(self, definitions: Iterable):
+        """Add many definitions to the registry at once.
+
+        Caches depending on definitions are cleared once for the whole batch,
+        and the dimensionality and compatible units of the new units are
+        added to the registry cache, so that it does not need to be rebuilt.
+
+        Parameters
+        ----------
+        definitions : Iterable
+            Definitions given as strings (possibly spanning several lines),
+            paths of definition files, or definition objects.
+
+        Returns
+        -------
+        list[UnitDefinition]
+            Definitions of the units that were added.
+
+        """
+        self._check_not_frozen()
+        self._clear_caches()
+        units = []
+        for item in definitions:
+            if isinstance(item, str | Path):
+                parsed_project = (
+                    self._def_parser.parse_string(item)
+                    if isinstance(item, str)
+                    else self._def_parser.parse_file(item)
+                )
+                batch = self._def_parser.iter_parsed_project(parsed_project)
+            else:
+                batch = (item,)
+            for definition in batch:
+                self._helper_dispatch_adder(definition)
+                if isinstance(definition, UnitDefinition):
+                    units.append(definition)
+        self._update_cache(units)
+        return units
+
+    def _update_cache(self, units: list[UnitDefinition]):
+        """Add dimensionality and compatible units of new units to cache."""
+        cache = self._caches[()]
+        equivalents = cache.dimensional_equivalents
+        for definition in units:
+            uc = UnitsContainer({definition.name: 1})
+            try:
+                dimensionality = self._get_dimensionality(uc)
+            except Exception:
+                # Leave units referring to undefined units out, as when
+                # building the cache.
                 continue
-            self.load_definitions(p)
+            cache.dimensionality[uc] = dimensionality
+            if not isinstance(equivalents.get(dimensionality), set):
+                equivalents[dimensionality] = set(
+                    equivalents.get(dimensionality, ())
+                )
+            equivalents[dimensionality].add(definition.name)
 
-    def _preprocess(self, s: str):
+    def _replay_definitions(self, definitions: list):
+        """Add already parsed definitions without warning on redefinitions."""
+        on_redefinition_backup = self._on_redefinition
+        self._on_redefinition = "ignore"
+        try:
+            for definition in definitions:
+                self._helper_dispatch_adder(definition)
+        finally:
+            self._on_redefinition = on_redefinition_backup
+
+    def _build_cache(self, loaded_files=None):
+        if isinstance(loaded_files, RegistrySnapshot):
+            self._cache = self._caches[()] = loaded_files.cache
+            return
+        if isinstance(loaded_files, CompiledDefinitions):
+            if loaded_files.cache is not None:
+                self._cache = self._caches[()] = loaded_files.cache
+                return
+            loaded_files = None
+        super()._build_cache(loaded_files)
+
+    def _helper_dispatch_adder(self, definition):
+        if self._definitions_log is not None:
+            self._definitions_log.append(definition)
+        super()._helper_dispatch_adder(definition)
+
+    def enable_contexts(self, *names_or_contexts, **kwargs):
+        """Enable contexts provided by name or by object.
+
+        Contexts that are available but have not been used yet are loaded
+        from their definition files first.
+
+        Parameters
+        ----------
+        *names_or_contexts :
+            One or more contexts or context names/aliases.
+        **kwargs :
+            Keyword arguments for the context(s).
+
+        """
+        if self._frozen:
+            raise RuntimeError(
+                "Contexts cannot be enabled in a frozen registry. Pass them "
+                "to conversions instead, e.g. `q.to(units, context)`."
+            )
+        for name in names_or_contexts:
+            if isinstance(name, str) and name not in self._contexts:
+                self._load_context(name)
+        super().enable_contexts(*names_or_contexts, **kwargs)
+
+    def _load_context(self, name: str):
+        """Load context from its definition file if not loaded yet."""
+        fpath = self._lazy_contexts.get(name)
+        if fpath is None:
+            return
+        definition = self._compiled_contexts.get(name)
+        if definition is None:
+            parsed_project = self._def_parser.parse_file(fpath)
+            (definition,) = self._def_parser.iter_parsed_project(
+                parsed_project
+            )
+        self._add_context_table(definition)
+        del self._lazy_contexts[name]
+
+    def add_context(self, context):
+        """Add a context to the registry.
+
+        Parameters
+        ----------
+        context : Context or ContextDefinition
+            The context to add, accessible by its name and aliases.
+
+        """
+        # Loading a lazy context adds a new context, which does not change
+        # any cached conversion factors.
+        self._check_not_frozen()
+        if context.name not in self._lazy_contexts:
+            self._clear_caches()
+        super().add_context(context)
+
+    def remove_context(self, name_or_alias: str):
+        """Remove a context from the registry and return it.
+
+        Parameters
+        ----------
+        name_or_alias : str
+            Name or alias of the context.
+
+        """
+        self._check_not_frozen()
+        self._clear_caches()
+        context = super().remove_context(name_or_alias)
+        self._context_tables.pop(context.name, None)
+        return context
+
+    def _add_context_table(self, definition: ContextDefinition):
+        """Add context, storing redefinitions by factors as table.
+
+        Contexts that only redefine units by factors of other units, such as
+        the assessment contexts, are added without redefinitions. Their
+        units are redefined from the table on first lookup instead, so that
+        activating them does not depend on the number of units they redefine.
+        """
+        if (
+            definition.relations
+            or definition.defaults
+            or not all(
+                isinstance(d.converter, ScaleConverter)
+                for d in definition.redefinitions
+            )
+        ):
+            self._helper_dispatch_adder(definition)
+            return
+        self._context_tables[definition.name] = {
+            d.name: (d.converter, d.reference)
+            for d in definition.redefinitions
+        }
+        self._helper_dispatch_adder(replace(definition, redefinitions=()))
+
+    def _switch_context_cache_and_units(self):
+        """Switch cache and units to those of the active contexts.
+
+        Unlike in pint, the cache and units of a combination of contexts are
+        created once and reused whenever it is activated again. Units of
+        contexts stored as tables are redefined lazily.
+        """
+        del self._units.maps[:-1]
+        contexts = self._active_ctx.contexts
+        tables = [
+            self._context_tables[ctx.name]
+            for ctx in contexts
+            if ctx.name in self._context_tables
+        ]
+        if not tables and not any(ctx.redefinitions for ctx in contexts):
+            self._cache = self._caches[()]
+            return
+
+        key = self._active_ctx.hashable()
+        if key in self._context_units:
+            self._cache = self._caches[key]
+            self._units.maps.insert(0, self._context_units[key])
+            return
+
+        self._cache = ContextCacheOverlay(self._caches[()])
+        units = _ContextUnits(self._units.maps[-1], tables)
+        self._units.maps.insert(0, units)
+
+        # Other redefinitions are added as in pint and take precedence over
+        # those of tables.
+        on_redefinition_backup = self._on_redefinition
+        self._on_redefinition = "ignore"
+        try:
+            for ctx in reversed(contexts):
+                for definition in ctx.redefinitions:
+                    self._redefine(definition)
+        finally:
+            self._on_redefinition = on_redefinition_backup
+
+        # Store cache and units for reuse only once complete, as views of
+        # frozen registries look them up concurrently.
+        self._caches[key] = self._cache
+        self._context_units[key] = units
+
+    def preload(self):
+        """Load all contexts and define all stored flows and currency units.
+
+        By default, assessment contexts, flows and units of currencies in
+        years are only loaded once first used. Preloading them is useful for
+        long-running processes, so that no definitions have to be loaded while
+        serving conversions.
+        """
+        for name in list(self._lazy_contexts):
+            self._load_context(name)
+        self.define_flows(
+            [flow for flow in self._stored_flows if flow not in self._flows]
+        )
+        self._define_currency_units(self._currency_defs)
+
+    def freeze(self):
+        """Freeze registry, so that threads can share it for converting.
+
+        All contexts and stored flows are loaded and the caches of all
+        contexts are built. Afterwards, no definitions can be added and
+        contexts cannot be enabled directly, but only via conversions such as
+        `q.to(units, context)`.
+
+        Conversions in contexts activate them on a view of the registry with
+        its own units, cache and active contexts (see `_view`), so that no
+        conversion changes the units or cache other threads parse, format or
+        convert with. Conversions run concurrently without locking. Freezing
+        cannot be undone.
+        """
+        if self._frozen:
+            return
+        self.preload()
+
+        # Activate each context once, so that pint checks its transformations
+        # and its cache and units are built before threads share them.
+        for name in self.contexts:
+            with self.context(name):
+                pass
+        self._frozen = True
+
+    def _view(self) -> "CETUnitRegistry":
+        """Return view of frozen registry for converting in contexts.
+
+        The view shares definitions, contexts and caches with the registry,
+        but has its own units, cache and active contexts, which activating
+        contexts switches. Caches and units of new combinations of contexts
+        are stored in the registry once complete.
+        """
+        view = object.__new__(type(self))
+        view.__dict__.update(self.__dict__)
+        # Methods instrumented for stats are bound to the registry.
+        for name in STATS_METHODS:
+            view.__dict__.pop(name, None)
+        view._units = ChainMap(self._units.maps[-1])
+        view._cache = self._caches[()]
+        view._active_ctx = ContextChain()
+        view._frozen = False
+        return view
+
+    def _check_not_frozen(self):
+        """Raise error if definitions are added to a frozen registry."""
+        if self._frozen:
+            raise RuntimeError(
+                "Definitions cannot be added to a frozen registry."
+            )
+
+    def gwp_matrix(self) -> GWPMatrix:
+        """Return matrix of emission metrics of species in assessments.
+
+        The matrix is computed on first call (loading all assessment
+        contexts) and reused afterwards. It requires NumPy.
+
+        Returns
+        -------
+        GWPMatrix
+            Matrix of factors converting masses of `species` into masses of
+            CO2eq in `assessments`, which can aggregate inventories of many
+            species in a single vectorized pass.
+
+        """
+        # Computing the matrix activates contexts, which frozen registries
+        # only do on views.
+        if self._gwp_matrix is None:
+            self._gwp_matrix = GWPMatrix.from_registry(
+                self._view() if self._frozen else self
+            )
+        return self._gwp_matrix
+
+    def currency_table(self) -> CurrencyTable:
+        """Return table of values of currencies in price-base years.
+
+        The table is computed on first call and reused afterwards. It
+        requires NumPy.
+
+        Returns
+        -------
+        CurrencyTable
+            Table of deflators and exchange rates of `currencies` by year,
+            which can convert values with per-row currencies and years in a
+            single vectorized pass.
+
+        """
+        if self._currency_table is None:
+            self._currency_table = CurrencyTable.from_registry(self)
+        return self._currency_table
+
+    def _clear_caches(self):
+        """Clear caches depending on unit definitions."""
+        self._conversion_factor_cached.cache_clear()
+        self._format_units_cached.cache_clear()
+        self._gwp_matrix = None
+        self._currency_table = None
+
+        # Drop caches and units of contexts, which depend on definitions.
+        for key in [key for key in self._caches if key]:
+            del self._caches[key]
+        self._context_units.clear()
+
+    def conversion_cache_info(self):
+        """Return statistics of the conversion-factor cache.
+
+        Returns
+        -------
+        functools._CacheInfo
+            Named tuple with the numbers of hits and misses, the maximum size
+            and the current size of the cache.
+
+        """
+        return self._conversion_factor_cached.cache_info()
+
+    def enable_stats(
+        self, callback: Callable[[str, float], None] | None = None
+    ):
+        """Start counting and timing phases of the registry.
+
+        The phases are `preprocess` (once per string parsed by `parse_units`
+        or `parse_expression`), `parse_units`, `parse_expression`, `convert`
+        and `convert_context` (converting quantities without and with
+        contexts), `context` (activating contexts), `define`,
+        `load_definitions`, `format` and `build_cache` (building or updating
+        the registry cache). Unless enabled, the registry is not instrumented
+        at all, so that stats cost nothing.
+
+        Parameters
+        ----------
+        callback : Callable[[str, float], None] | None, optional
+            Function called with the name of the phase and the time in
+            seconds after each call, e.g. to send them to a metrics system.
+
+        """
+        self.disable_stats()
+        stats = self._stats = RegistryStats()
+
+        def timed(phase, func, key=None):
+            return stats.timed(phase, func, callback, key)
+
+        def string_key(input_string, *args, **kwargs):
+            return input_string
+
+        # Time all preprocessors at once and only while parsing, so that
+        # preprocessing is counted once per parsed string, although pint
+        # also preprocesses unit strings before parsing them, e.g. in
+        # `Quantity.to`.
+        preprocessors = list(self.preprocessors)
+        parsing = False
+
+        def preprocess_all(input_string):
+            for p in preprocessors:
+                input_string = p(input_string)
+            return input_string
+
+        preprocess_parsed = timed("preprocess", preprocess_all)
+
+        def preprocess(input_string):
+            if parsing:
+                return preprocess_parsed(input_string)
+            return preprocess_all(input_string)
+
+        def parse(phase, func):
+            def wrapper(*args, **kwargs):
+                nonlocal parsing
+                parsing_outer, parsing = parsing, True
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    parsing = parsing_outer
+
+            return timed(phase, wraps(func)(wrapper), string_key)
+
+        def conversion_key(value, src, dst, contexts=(), *args, **kwargs):
+            return src, dst, contexts
+
+        convert = timed("convert", self._convert_cached, conversion_key)
+        convert_context = timed(
+            "convert_context", self._convert_cached, conversion_key
+        )
+
+        def convert_cached(value, src, dst, contexts=(), *args, **kwargs):
+            func = convert_context if contexts else convert
+            return func(value, src, dst, contexts, *args, **kwargs)
+
+        # Shadow methods by instrumented instance attributes, which are
+        # removed again when disabling stats.
+        self.__dict__.update(
+            parse_units_as_container=parse(
+                "parse_units", self.parse_units_as_container
+            ),
+            parse_expression=parse("parse_expression", self.parse_expression),
+            _convert_cached=convert_cached,
+            enable_contexts=timed("context", self.enable_contexts),
+            define=timed("define", self.define),
+            define_many=timed("define", self.define_many),
+            load_definitions=timed("load_definitions", self.load_definitions),
+            _build_cache=timed("build_cache", self._build_cache),
+            _update_cache=timed("build_cache", self._update_cache),
+        )
+        self._stats_restore = {
+            "preprocessors": list(self.preprocessors),
+            "format_quantity": self.formatter.format_quantity,
+        }
+        self.preprocessors[:] = [preprocess]
+        self.formatter.format_quantity = timed(
+            "format", self.formatter.format_quantity
+        )
+
+    def disable_stats(self):
+        """Stop counting and timing phases of the registry.
+
+        The stats collected so far remain available via `stats`.
+        """
+        if self._stats_restore is None:
+            return
+        for name in STATS_METHODS:
+            del self.__dict__[name]
+        self.preprocessors[:] = self._stats_restore["preprocessors"]
+        self.formatter.format_quantity = self._stats_restore["format_quantity"]
+        self._stats_restore = None
+
+    def stats(self) -> RegistryStats:
+        """Return stats collected since they were last enabled.
+
+        Returns
+        -------
+        RegistryStats
+            Numbers of calls and times of each phase, and the most frequent
+            unit strings and conversions, e.g. to decide which conversions to
+            prepare converters for.
+
+        """
+        return self._stats if self._stats is not None else RegistryStats()
+
+    def converter(
+        self,
+        src: str | Unit,
+        dst: str | Unit,
+        context: str | list[str] | tuple[str, ...] | None = None,
+    ) -> Converter:
+        """Create converter applying a fixed conversion to plain numbers.
+
+        The conversion is resolved once (including rewriting of species,
+        activation of contexts, and deflation of currencies), so that calling
+        the converter only multiplies by the resulting factor.
+
+        Parameters
+        ----------
+        src : str | Unit
+            Units to convert from, e.g. `"t CH4/a"`.
+        dst : str | Unit
+            Units to convert to, e.g. `"Mt CO2eq/a"`.
+        context : str | list[str] | tuple[str, ...] | None, optional
+            Name or names of contexts to convert in, e.g. `"AR6GWP100"`.
+
+        Returns
+        -------
+        Converter
+            Picklable callable that multiplies values by the conversion
+            factor.
+
+        Raises
+        ------
+        ValueError
+            If a context is unknown, or if the conversion is not a plain
+            multiplication, e.g. between temperature scales.
+
+        """
+        if context is None:
+            contexts = ()
+        elif isinstance(context, str):
+            contexts = (context,)
+        else:
+            contexts = tuple(context)
+        known = self.contexts
+        for name in contexts:
+            if name not in known:
+                raise ValueError(f"Unknown context: {name}")
+        factor = self._conversion_factor_cached(
+            self.Unit(src)._units, self.Unit(dst)._units, contexts
+        )
+        if factor is None:
+            raise ValueError(
+                f"Conversion from '{src}' to '{dst}' is not a plain "
+                "multiplication and cannot be applied by a converter."
+            )
+        return Converter(str(src), str(dst), contexts, float(factor))
+
+    def _convert_cached(
+        self,
+        value,
+        src,
+        dst,
+        contexts: tuple = (),
+        ctx_kwargs: dict | None = None,
+        inplace: bool = False,
+    ):
+        """Convert value from source to destination units in contexts.
+
+        Multiplicative conversions (including those in contexts that only
+        redefine units, such as the assessment contexts) are computed once
+        per combination of source units, destination units and contexts, and
+        then applied as a factor without activating any contexts.
+        """
+        if (
+            src != dst
+            and not ctx_kwargs
+            and not self._active_ctx.contexts
+            and all(isinstance(c, str) for c in contexts)
+            and not isinstance(value, Decimal | Fraction)
+        ):
+            factor = self._conversion_factor_cached(src, dst, contexts)
+            if factor is not None:
+                if inplace:
+                    value *= factor
+                    return value
+                return value * factor
+
+        # Frozen registries activate contexts on views only.
+        ureg = (
+            self._view() if self._frozen and (contexts or ctx_kwargs) else self
+        )
+        if contexts:
+            with ureg.context(*contexts, **(ctx_kwargs or {})):
+                return ureg.convert(value, src, dst)
+        return ureg.convert(value, src, dst, inplace, **(ctx_kwargs or {}))
+
+    def _conversion_factor(self, src, dst, contexts: tuple):
+        """Compute conversion factor, or None if not multiplicative."""
+        try:
+            if self._validate_and_extract(src) or self._validate_and_extract(
+                dst
+            ):
+                return None
+        except ValueError:
+            return None
+        for name in contexts:
+            self._load_context(name)
+            if name not in self._contexts or self._contexts[name].funcs:
+                return None
+        if contexts:
+            # Frozen registries activate contexts on views only.
+            ureg = self._view() if self._frozen else self
+            with ureg.context(*contexts):
+                return ureg.convert(1, src, dst)
+        return self.convert(1, src, dst)
+
+    def _compile_species(self):
+        """Compile the patterns used for rewriting species in unit strings.
+
+        The patterns and the memoized results are only valid for the current
+        list of species, so this must be called whenever the list changes.
+        """
         if not self._species:
-            return s
-        return sub(
-            rf"(g|t|gram|metric_ton) ({'|'.join(self._species)})", r"\1__\2", s
+            self._species_pre = self._species_post = str
+            return
+
+        # Longer species first, so that e.g. `CO2eq` is preferred over `C`.
+        alternatives = "|".join(
+            escape(s) for s in sorted(self._species, key=len, reverse=True)
+        )
+        pattern_pre = re_compile(rf"(g|t|gram|metric_ton) ({alternatives})")
+        pattern_post = re_compile(rf"(g|t|gram|metric_ton)__({alternatives})")
+        self._species_pre = lru_cache(maxsize=SPECIES_CACHE_SIZE)(
+            partial(pattern_pre.sub, r"\1__\2")
+        )
+        self._species_post = lru_cache(maxsize=SPECIES_CACHE_SIZE)(
+            partial(pattern_post.sub, r"\1 \2")
         )
 
+    def _preprocess(self, s: str):
+        return self._species_pre(s)
+
     def _postprocess(self, s: str):
-        if not self._species:
-            return s
-        return sub(
-            rf"(g|t|gram|metric_ton)__({'|'.join(self._species)})", r"\1 \2", s
+        return self._species_post(s)
+
+    def _format_quantity(self, quantity, spec: str = "", **babel_kwds):
+        """Format quantity, rewriting species in its units.
+
+        For scalar magnitudes, the units are formatted (and species
+        rewritten) once per units and format spec, so that only the
+        magnitude is formatted on each call.
+        """
+        formatter = self.formatter
+        spec = spec or formatter.default_format
+        if not (
+            babel_kwds
+            or formatter.locale is not None
+            or "#" in spec
+            or iterable(quantity.magnitude)
+        ):
+            units = self._format_units_cached(
+                quantity._units,
+                spec,
+                formatter.default_format,
+                formatter.default_sort_func,
+            )
+            if units is not None:
+                sub_formatter, joint, mspec, ustr, kwargs = units
+                mstr = sub_formatter.format_magnitude(
+                    quantity.magnitude, mspec, **kwargs
+                )
+                return join_mu(joint, mstr, ustr)
+
+        return self._postprocess(
+            self._format_quantity_full(quantity, spec, **babel_kwds)
+        )
+
+    def _format_units(self, units, spec: str, default_format: str, sort_func):
+        """Format units of quantities, or None if not formatted separately."""
+        sub_formatter = self.formatter.get_formatter(spec)
+        joint = FORMAT_JOINTS.get(type(sub_formatter))
+        if joint is None:
+            return None
+        mspec, uspec = split_format(
+            spec, default_format, self.separate_format_defaults
+        )
+        kwargs = {
+            "use_plural": False,
+            "length": None,
+            "locale": None,
+            "as_ratio": "^" not in spec,
+        }
+        ustr = self._postprocess(
+            sub_formatter.format_unit(
+                units.unit_items(), uspec, sort_func, **kwargs
+            )
         )
+        return sub_formatter, joint, mspec, ustr, kwargs
 
     def define_flows(self, flows: tuple[str] | list[str] | dict):
         """Define flow units.
@@ -159,6 +1207,8 @@ class CETUnitRegistry(UnitRegistry):
                     "to loadable flow definition files."
                 )
             flows = {flow_id: flow_id for flow_id in flows}
+        definitions = []
+        self._flows.update(flows)
         for flow_id, flow_specs in flows.items():
             if isinstance(flow_specs, str):
                 if not self._unit_defs_path:
@@ -166,14 +1216,306 @@ class CETUnitRegistry(UnitRegistry):
                         "To load existing flow definitions, the "
                         "directory must be set as a path."
                     )
-                self.load_definitions(
+                definitions.append(
                     self._unit_defs_path
                     / "generated"
                     / "flows"
                     / f"{flow_specs}.txt"
                 )
             elif isinstance(flow_specs, dict):
-                self.define(self.generate_units_defs_flow(flow_id, flow_specs))
+                self._flow_specs[flow_id] = flow_specs
+                definitions.extend(
+                    d[1]
+                    for d in self._generate_flow_defs(flow_id, flow_specs)
+                    if d is not None
+                )
+
+        # Add definitions of all flows at once.
+        units = self.define_many(definitions)
+        self._index_flow_units(list(flows), units)
+
+    def _index_flow_units(self, flow_ids: list[str], units: list):
+        """Add units of newly defined flows to the index."""
+        # Unit names consist of a physical unit, the flow and a variant,
+        # e.g. `watt_hour_H2_LHV`. Longer flows first, e.g. `crude_oil`.
+        flows = sorted(flow_ids, key=len, reverse=True)
+        pattern = re_compile(
+            rf"(.+?)_({'|'.join(map(escape, flows))})(?:_([^_]+))?"
+        )
+        flow_units = {flow_id: [] for flow_id in flow_ids}
+        for definition in units:
+            match = pattern.fullmatch(definition.name)
+            if match is None:
+                continue
+            physical, flow_id, variant = match.groups()
+            try:
+                dimensionality = self._get_dimensionality(
+                    UnitsContainer({definition.name: 1})
+                )
+            except UndefinedUnitError:
+                # Skip units referring to undefined units, e.g. power units
+                # of flows without energy content.
+                continue
+            unit = FlowUnit(
+                definition.name,
+                flow_id,
+                variant or "",
+                self._flow_dimension(physical),
+                (flow_id, dimensionality),
+            )
+            names = (*definition.aliases, definition.defined_symbol)
+            flow_units[flow_id].append((unit, [n for n in names if n]))
+        for flow_id, units_of_flow in flow_units.items():
+            self._unit_index.add_flow(flow_id, units_of_flow)
+
+    def _flow_dimension(self, physical: str) -> str:
+        """Return name of the dimension of a physical unit, e.g. `mass`."""
+        if self._flow_dimensions is None:
+            self._flow_dimensions = {}
+        if physical not in self._flow_dimensions:
+            names = {
+                self.get_dimensionality(units[0]): dim
+                for dim, units in FLOW_EXTEND_UNITS.items()
+            }
+            names[self.get_dimensionality("watt")] = "power"
+            dimensionality = self.get_dimensionality(physical)
+            self._flow_dimensions[physical] = names.get(
+                dimensionality, str(dimensionality)
+            )
+        return self._flow_dimensions[physical]
+
+    def flow_units(self, flow_id: str) -> dict[str, dict[str, list[str]]]:
+        """Return names of the units of a flow.
+
+        Stored flows that are not defined yet are defined first, unless
+        `flows_on_demand` is disabled.
+
+        Parameters
+        ----------
+        flow_id : str
+            ID of the flow, e.g. `"H2"`.
+
+        Returns
+        -------
+        dict[str, dict[str, list[str]]]
+            Names of units by variant (e.g. `"LHV"`, or `""` for units without
+            variant) and dimension (e.g. `"energy"`).
+
+        Raises
+        ------
+        ValueError
+            If the flow is unknown.
+
+        """
+        if (
+            flow_id not in self._unit_index.flows
+            and self.flows_on_demand
+            and flow_id in self._stored_flows
+        ):
+            self.define_flows([flow_id])
+        try:
+            variants = self._unit_index.flows[flow_id]
+        except KeyError:
+            raise ValueError(f"Unknown flow: {flow_id}") from None
+        # Return copies, so that callers cannot change the index.
+        return {
+            variant: {dim: list(names) for dim, names in units.items()}
+            for variant, units in variants.items()
+        }
+
+    def compatible_flow_units(self, unit: str) -> list[str]:
+        """Return names of the flow units a flow unit can be converted to.
+
+        This looks up the index rather than searching the registry like
+        `get_compatible_units`, and includes the unit itself.
+
+        Parameters
+        ----------
+        unit : str
+            Name, symbol or alias of a flow unit, possibly with a prefix,
+            e.g. `"kg_H2"`.
+
+        Returns
+        -------
+        list[str]
+            Names of units of the same flow with the same dimensionality,
+            e.g. `gram_H2`, `watt_hour_H2_LHV` and `cubic_meter_H2_norm`.
+
+        Raises
+        ------
+        ValueError
+            If the unit is not a unit of a defined or stored flow.
+
+        """
+        entry = self._unit_index.units.get(unit)
+        if entry is None:
+            # Resolve prefixes, defining stored flows on demand.
+            try:
+                name = self.get_name(unit)
+            except UndefinedUnitError:
+                name = unit
+            for _, base_name, _ in self.parse_unit_name(name):
+                entry = self._unit_index.units.get(base_name, entry)
+            if entry is None:
+                raise ValueError(f"Not a flow unit: {unit}")
+            self._unit_index.units[unit] = entry
+        return list(self._unit_index.compatible[entry.compatible])
+
+    def currency_years(self, currency: str) -> list[int]:
+        """Return price-base years for which a currency is defined.
+
+        Parameters
+        ----------
+        currency : str
+            Name of the currency, e.g. `"EUR"`.
+
+        Raises
+        ------
+        ValueError
+            If the currency is unknown.
+
+        """
+        try:
+            return list(self._unit_index.currencies[currency])
+        except KeyError:
+            raise ValueError(f"Unknown currency: {currency}") from None
+
+    def species_contexts(self, species: str) -> list[str]:
+        """Return names of assessment contexts with a metric for a species.
+
+        The species are indexed on first call, which loads all assessment
+        contexts.
+
+        Parameters
+        ----------
+        species : str
+            Name of the species, e.g. `"CH4"`.
+
+        Returns
+        -------
+        list[str]
+            Names of the assessment contexts in which masses of the species
+            can be converted to masses of CO2eq. Species such as CO2 that can
+            be converted without context have all assessment contexts.
+
+        Raises
+        ------
+        ValueError
+            If the species is unknown.
+
+        """
+        if self._unit_index.species is None:
+            self._unit_index.species = self._index_species()
+        try:
+            return list(self._unit_index.species[species])
+        except KeyError:
+            raise ValueError(f"Unknown species: {species}") from None
+
+    def _index_species(self) -> dict[str, list[str]]:
+        """Find assessment contexts with a metric for each species."""
+        tables = {}
+        for name in self.assessments:
+            self._load_context(name)
+            tables[name] = self._context_tables.get(name) or {
+                d.name: (d.converter, d.reference)
+                for d in self._contexts[name].redefinitions
+            }
+        index = {}
+        for species in ["CO2", *self._species]:
+            unit_name = f"gram__{species}"
+            definition = self._units.maps[-1].get(unit_name)
+            if definition is None:
+                continue
+            if not isnan(definition.converter.scale):
+                index[species] = list(self.assessments)
+                continue
+            index[species] = [
+                name
+                for name, table in tables.items()
+                if unit_name in table and not isnan(table[unit_name][0].scale)
+            ]
+        return index
+
+    def get_name(self, name_or_alias: str, case_sensitive=None) -> str:
+        """Return the canonical name of a unit.
+
+        If the unit is not defined but belongs to a stored flow that has not
+        been defined yet, the flow is defined first (see `flows_on_demand`).
+        """
+        try:
+            return super().get_name(name_or_alias, case_sensitive)
+        except UndefinedUnitError:
+            if not (
+                self._define_currency_on_demand(name_or_alias)
+                or self._define_flow_on_demand(name_or_alias)
+            ):
+                raise
+        return super().get_name(name_or_alias, case_sensitive)
+
+    def _define_currency_on_demand(self, unit_name: str) -> bool:
+        """Define the currency unit a unit refers to, if not defined yet.
+
+        The unit name may contain a prefix, e.g. `kEUR_2020`. Returns True if
+        the currency unit was defined.
+        """
+        if self._currency_unit_pattern is None:
+            return False
+        match = self._currency_unit_pattern.search(unit_name)
+        if (
+            match is None
+            or match.group(0) not in self._currency_defs
+            or match.group(0) in self._units.maps[-1]
+        ):
+            return False
+
+        # Units must not end up in the overlay of an active context.
+        overlays = self._units.maps[:-1]
+        del self._units.maps[:-1]
+        try:
+            self._define_currency_units([match.group(0)])
+        finally:
+            self._units.maps[:0] = overlays
+        return True
+
+    def _define_currency_units(self, names: Iterable[str]):
+        """Define currency units and the currency units they refer to."""
+        definitions = {}
+
+        def collect(name: str):
+            if name in definitions or name in self._units.maps[-1]:
+                return
+            (definition,) = self._def_parser.iter_parsed_project(
+                self._def_parser.parse_string(self._currency_defs[name])
+            )
+            for reference in definition.reference:
+                if reference in self._currency_defs:
+                    collect(reference)
+            definitions[name] = definition
+
+        for name in names:
+            collect(name)
+        if definitions:
+            self.define_many(definitions.values())
+
+    def _define_flow_on_demand(self, unit_name: str) -> bool:
+        """Define the stored flow a unit belongs to, if not defined yet.
+
+        Returns True if a flow was defined.
+        """
+        if not self.flows_on_demand or self._flow_unit_pattern is None:
+            return False
+        match = self._flow_unit_pattern.search(unit_name)
+        if match is None or match.group(1) in self._flows:
+            return False
+
+        # Units must not end up in the overlay of an active context.
+        overlays = self._units.maps[:-1]
+        del self._units.maps[:-1]
+        try:
+            self.define_flows([match.group(1)])
+        finally:
+            self._units.maps[:0] = overlays
+        return True
 
     def generate_units_defs_flow(
         self,
@@ -194,93 +1536,273 @@ class CETUnitRegistry(UnitRegistry):
             Definitions can be printed to standard out while generated.
 
         """
-        # Temporary bugfix: compatible units are not determined correctly when
-        # unit registry is loaded from cache.
-        self._build_cache()
+        ret = "\n".join(
+            "" if d is None else d[0]
+            for d in self._generate_flow_defs(flow_id, flow_specs)
+        )
+
+        if print_defs:
+            print(ret)
+
+        return ret
+
+    def _generate_flow_defs(
+        self,
+        flow_id: str,
+        flow_specs: dict[str, str],
+    ) -> list[tuple[str, UnitDefinition] | None]:
+        """Generate flow units definitions as text and definition objects.
 
+        The conversion factors are computed from quantities of the flow
+        properties, which are parsed once per flow, so that no unit strings
+        are parsed per definition. The definition objects are equal to those
+        obtained from parsing the text, and None separates groups of
+        definitions.
+        """
         # List of definitions that will be returned.
         defs = []
 
-        # Define base unit and base dimension.
-        bu = self.Unit("gram")
-        bd = "mass"
-        assert self.Quantity(str(bu)).check(f"[{bd}]")
+        # Define base unit (gram, the first unit of the base dimension).
+        bu, bu_name, bu_symbol = self._flow_units()["mass"][0]
+        bu_flow = f"{bu_symbol}_{flow_id}"
 
         # Define name of dimension for new amount units.
         dim = flow_specs["name"].lower().replace(" ", "_")
 
         # Define base unit.
-        defs.append(f"{bu:P}_{flow_id} = [amount_of_{dim}] = {bu:~}_{flow_id}")
-        defs.append("")
+        defs.append(
+            _flow_def(
+                f"{bu_name}_{flow_id}",
+                f"[amount_of_{dim}]",
+                bu_flow,
+                1,
+                {f"[amount_of_{dim}]": 1},
+            )
+        )
+        defs.append(None)
 
         # Define units for base dimension.
-        for u in FLOW_EXTEND_UNITS[bd]:
+        for u, u_name, u_symbol in self._flow_units()["mass"]:
             if u == bu:
                 continue
-            u = self.Unit(u)
-            conv_fac = self.Quantity(f"{u:~}/{bu:~}").to_reduced_units()
-            conv_fac = conv_fac.m if conv_fac.dimensionless else conv_fac
+            conv_fac = self._flow_conv_fac(u, bu, None, False)
             defs.append(
-                f"{u:P}_{flow_id} = "
-                f"{conv_fac:.3g} * {bu}_{flow_id} = "
-                f"{u:~}_{flow_id}"
+                _flow_def(
+                    f"{u_name}_{flow_id}",
+                    f"{conv_fac:.3g} * {bu_flow}",
+                    f"{u_symbol}_{flow_id}",
+                    *_scale_and_reference(conv_fac, bu_flow),
+                )
             )
-        defs.append("")
+        defs.append(None)
+
+        # Parse flow properties once.
+        specs = {
+            factor: self.Quantity(flow_specs[factor])
+            for variants in FLOW_UNIT_VARIANTS.values()
+            for factor, _ in variants.values()
+            if factor in flow_specs
+        }
 
         # Now define new units.
         for dim, variants in FLOW_UNIT_VARIANTS.items():
-            for u in FLOW_EXTEND_UNITS[dim]:
-                u = self.Unit(u)
+            for u, u_name, u_symbol in self._flow_units()[dim]:
                 for var, (factor, rule) in variants.items():
-                    if (
-                        factor not in flow_specs
-                        or self.Quantity(flow_specs[factor]).m == 0.0
-                    ):
+                    if factor not in specs or specs[factor].m == 0.0:
                         continue
-                    pattern = rule.format(factor=flow_specs[factor])
-                    conv_fac = self.Quantity(
-                        f"{u:~}/{bu:~} {pattern}"
-                    ).to_reduced_units()
-                    conv_fac = (
-                        conv_fac.m if conv_fac.dimensionless else conv_fac
+                    conv_fac = self._flow_conv_fac(
+                        u, bu, specs[factor], rule.startswith("/")
                     )
-                    if len(variants) == 1:
-                        d = (
-                            f"{u:P}_{flow_id} = "
-                            f"{conv_fac:.3g} * {bu:~}_{flow_id} = "
-                            f"{u:~}_{flow_id}"
-                        )
-                    else:
-                        d = (
-                            f"{u:P}_{flow_id}_{var} = "
-                            f"{conv_fac:.3g} * {bu:~}_{flow_id} = "
-                            f"{u:~}_{flow_id}_{var}"
+                    suffix = (
+                        flow_id if len(variants) == 1 else f"{flow_id}_{var}"
+                    )
+                    defs.append(
+                        _flow_def(
+                            f"{u_name}_{suffix}",
+                            f"{conv_fac:.3g} * {bu_flow}",
+                            f"{u_symbol}_{suffix}",
+                            *_scale_and_reference(conv_fac, bu_flow),
                         )
-                    defs.append(d)
-            defs.append("")
+                    )
+            defs.append(None)
 
             # Special treatment for power (energy per time).
             if dim == "energy":
                 for var in variants:
-                    d = (
-                        f"watt_{flow_id}_{var} = "
-                        f"joule_{flow_id}_{var} / second = "
-                        f"W_{flow_id}_{var}"
+                    defs.append(
+                        _flow_def(
+                            f"watt_{flow_id}_{var}",
+                            f"joule_{flow_id}_{var} / second",
+                            f"W_{flow_id}_{var}",
+                            1.0,
+                            {f"joule_{flow_id}_{var}": 1, "second": -1},
+                        )
                     )
-                    defs.append(d)
-                defs.append("")
+                defs.append(None)
             if dim == "volume" and flow_id == "crude_oil":
-                d = (
-                    f"barrel_{flow_id} = "
-                    f"42 gallon_{flow_id}_norm = "
-                    f"bbl_{flow_id}"
+                defs.append(
+                    _flow_def(
+                        f"barrel_{flow_id}",
+                        f"42 gallon_{flow_id}_norm",
+                        f"bbl_{flow_id}",
+                        42,
+                        {f"gallon_{flow_id}_norm": 1},
+                    )
                 )
-                defs.append(d)
-                defs.append("")
+                defs.append(None)
 
-        ret = "\n".join(defs)
+        return defs
 
-        if print_defs:
-            print(ret)
+    def _flow_units(self) -> dict[str, list[tuple[Unit, str, str]]]:
+        """Return units extended for flows with their names and symbols."""
+        if self._flow_units_cache is None:
+            self._flow_units_cache = {
+                dim: [
+                    (u := self.Unit(name), f"{u:P}", f"{u:~}")
+                    for name in units
+                ]
+                for dim, units in FLOW_EXTEND_UNITS.items()
+            }
+        return self._flow_units_cache
 
-        return ret
+    def _flow_conv_fac(self, u: Unit, bu: Unit, spec, divide: bool):
+        """Compute conversion factor of flow unit to flow base unit.
+
+        This is equivalent to parsing `u / bu * spec` (or `u / bu / (spec)`)
+        and reducing the units, but without parsing any strings.
+        """
+        q = self.Quantity(1, u._units) / self.Quantity(1, bu._units)
+        if spec is not None:
+            q = q / spec if divide else q * spec
+        q = q.to_reduced_units()
+        return q.m if q.dimensionless else q
+
+
+# Registries by key of their unit definitions, used for unpickling
+# quantities.
+_registries: WeakValueDictionary = WeakValueDictionary()
+
+# Registries by ID, used for unpickling quantities in the same process.
+_pickled_registries: WeakValueDictionary = WeakValueDictionary()
+_pickle_ids = count()
+
+
+def _unpickle_registry(
+    fingerprint: tuple[str, str],
+    flow_specs: dict[str, dict],
+    pickle_id: tuple[int, int] | None = None,
+) -> CETUnitRegistry:
+    """Return registry with the unit definitions of a fingerprint.
+
+    Within the process that pickled the registry, the registry itself is
+    returned if it still exists. Otherwise, a registry with the same unit
+    definitions is used, preferably the registry of this package. Only if
+    its definitions differ, a registry is set up from the pickled path.
+    """
+    if pickle_id is not None and pickle_id[0] == getpid():
+        ureg = _pickled_registries.get(pickle_id[1])
+        if ureg is not None:
+            return ureg
+
+    path, key = fingerprint
+    ureg = _registries.get(key)
+    if ureg is None:
+        import cet_units
+
+        if cet_units.ureg._fingerprint()[1] == key:
+            ureg = cet_units.ureg
+        else:
+            ureg = CETUnitRegistry.from_unit_defs(
+                Path(path), cet_units.CACHE_FOLDER
+            )
+            if ureg._fingerprint()[1] != key:
+                raise ValueError(
+                    f"Unit definitions in '{path}' differ from those of the "
+                    "pickled registry."
+                )
+
+    # Define flows that were defined at runtime in the pickling process.
+    missing = {
+        flow_id: specs
+        for flow_id, specs in flow_specs.items()
+        if flow_id not in ureg._flows
+    }
+    if missing:
+        ureg.define_flows(missing)
+    return ureg
+
+
+class _ContextUnits(dict):
+    """Units of a combination of contexts, redefined from tables lazily.
+
+    Units redefined by tables are looked up in the tables of the contexts in
+    order on first access, and then stored like other redefinitions.
+    """
+
+    def __init__(self, base_units: dict, tables: list[dict]):
+        super().__init__()
+        self._base_units = base_units
+        self._tables = tables
+
+    def __missing__(self, key: str) -> UnitDefinition:
+        basedef = self._base_units.get(key)
+        if basedef is None:
+            raise KeyError(key)
+        for table in self._tables:
+            if basedef.name in table:
+                converter, reference = table[basedef.name]
+                break
+        else:
+            raise KeyError(key)
+        # Same as the redefinitions of contexts in pint.
+        definition = UnitDefinition(
+            name=basedef.name,
+            defined_symbol=basedef.symbol,
+            aliases=basedef.aliases,
+            reference=reference,
+            converter=converter,
+        )
+        self[key] = definition
+        return definition
+
+
+def _flow_def(
+    name: str, value: str, symbol: str, scale, reference: dict
+) -> tuple[str, UnitDefinition]:
+    """Return text and definition object of flow unit."""
+    return (
+        f"{name} = {value} = {symbol}",
+        UnitDefinition(
+            name,
+            symbol,
+            (),
+            ScaleConverter(scale),
+            UnitsContainer(reference),
+        ),
+    )
+
+
+def _scale_and_reference(conv_fac, bu_flow: str) -> tuple:
+    """Return scale and reference of `{conv_fac:.3g} * {bu_flow}`.
+
+    The scale is rounded to three significant digits and is an integer if
+    written as one without any division, and the units of the reference are
+    ordered as written (numerator before denominator), in the same way as
+    when parsing the text.
+    """
+    if isinstance(conv_fac, float | int):
+        magnitude, units = conv_fac, {}
+    else:
+        magnitude, units = conv_fac.m, dict(conv_fac._units)
+    text = f"{magnitude:.3g}"
+    try:
+        scale = int(text)
+    except ValueError:
+        scale = float(text)
+    if any(v < 0 for v in units.values()):
+        scale = float(scale)
+    return scale, {
+        **{k: v for k, v in units.items() if v > 0},
+        **{k: v for k, v in units.items() if v < 0},
+        bu_flow: 1,
+    }
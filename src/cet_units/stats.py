@@ -0,0 +1,103 @@
+"""Count and time phases of the CET unit registry."""
+
+from collections import Counter, defaultdict
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from functools import wraps
+from time import perf_counter
+
+
+@dataclass
+class RegistryStats:
+    """Numbers of calls and times spent in phases of a registry.
+
+    Stats are collected via `CETUnitRegistry.enable_stats`. Times of phases
+    include the times of phases nested in them, e.g. activating a context
+    while converting.
+
+    Attributes
+    ----------
+    calls : Counter[str]
+        Number of calls of each phase, e.g. `"parse_units"`.
+    times : defaultdict[str, float]
+        Total time in seconds spent in each phase.
+    keys : defaultdict[str, Counter]
+        Number of calls of each phase by key, i.e. by unit string for
+        parsing and by source units, destination units and contexts for
+        converting.
+
+    """
+
+    calls: Counter = field(default_factory=Counter)
+    times: defaultdict = field(default_factory=lambda: defaultdict(float))
+    keys: defaultdict = field(default_factory=lambda: defaultdict(Counter))
+
+    def most_common(self, phase: str, n: int = 10) -> list[tuple[str, int]]:
+        """Return the most frequent keys of a phase.
+
+        Parameters
+        ----------
+        phase : str
+            Name of the phase, e.g. `"parse_units"` or `"convert_context"`.
+        n : int, optional
+            Maximum number of keys to return (default: 10).
+
+        Returns
+        -------
+        list[tuple[str, int]]
+            Descriptions of the keys, e.g. `"tonne / year -> megatonne /
+            year [AR6GWP100]"` for conversions, with their numbers of calls.
+
+        """
+        return [
+            (_describe(key), count)
+            for key, count in self.keys[phase].most_common(n)
+        ]
+
+    def timed(
+        self,
+        phase: str,
+        func: Callable,
+        callback: Callable[[str, float], None] | None = None,
+        key: Callable | None = None,
+    ) -> Callable:
+        """Wrap function, so that its calls are counted and timed.
+
+        Parameters
+        ----------
+        phase : str
+            Name of the phase the calls are recorded as.
+        func : Callable
+            Function to wrap.
+        callback : Callable[[str, float], None] | None, optional
+            Function called with the phase and the time in seconds after
+            each call, e.g. to send them to a metrics system.
+        key : Callable | None, optional
+            Function returning the key of a call from its arguments.
+
+        """
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = perf_counter() - start
+                self.calls[phase] += 1
+                self.times[phase] += elapsed
+                if key is not None:
+                    self.keys[phase][key(*args, **kwargs)] += 1
+                if callback is not None:
+                    callback(phase, elapsed)
+
+        return wrapper
+
+
+def _describe(key) -> str:
+    if not isinstance(key, tuple):
+        return str(key)
+    src, dst, contexts = key
+    if not contexts:
+        return f"{src} -> {dst}"
+    return f"{src} -> {dst} [{', '.join(map(str, contexts))}]"
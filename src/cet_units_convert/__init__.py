@@ -0,0 +1,5 @@
+"""Package of the `units-convert` command of the CET Units package.
+
+It is separate from `cet_units`, so that the command can forward conversions
+to a running server without creating the unit registry on import.
+"""
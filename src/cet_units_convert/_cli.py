@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+from argparse import ArgumentParser, FileType, Namespace
+import csv
+import json
+import os
+import re
+import shlex
+import sys
+from pathlib import Path
+
+from ._search import KINDS, UNIT_DEFS_PATH, SearchIndex
+from ._server import default_socket_path, request, serve
+
+# Names of units in quantity strings, excluding exponents of numbers.
+UNIT_NAME_PATTERN = re.compile(r"(?<![\w.])[A-Za-z_]\w*")
+
+
+class FromToParser(ArgumentParser):
+    def error(self, message):
+        # Raise instead of exiting when parsing lines in batch mode.
+        if not self.exit_on_error:
+            raise ValueError(message)
+        super().error(message)
+
+    def _parse_known_args(self, arg_strings, *args, **kwargs):
+        # Extract optional flags first.
+        remaining_args = []
+        skip_next = False
+        context_value = None
+
+        for i, arg in enumerate(arg_strings):
+            if skip_next:
+                skip_next = False
+                continue
+            if arg == "--context":
+                if i + 1 >= len(arg_strings):
+                    self.error("--context requires a value")
+                context_value = arg_strings[i + 1]
+                skip_next = True
+            else:
+                remaining_args.append(arg)
+
+        # Expect the format: from X to Y.
+        if (
+            len(remaining_args) < 4
+            or remaining_args[0] != "from"
+            or "to" not in remaining_args
+        ):
+            self.error("Usage: from X to Y [--context CONTEXT]")
+
+        from_index = remaining_args.index("from")
+        to_index = remaining_args.index("to")
+
+        if (
+            from_index != 0
+            or to_index <= from_index + 1
+            or to_index >= len(remaining_args) - 1
+        ):
+            self.error("Usage: from X to Y [--context CONTEXT]")
+
+        unit_from = " ".join(remaining_args[from_index + 1 : to_index])
+        unit_to = " ".join(remaining_args[to_index + 1 :])
+
+        ns = Namespace(
+            unit_from=unit_from,
+            unit_to=unit_to,
+            context=context_value,
+        )
+        return ns, []
+
+
+def convert_quantity(q_from: str, unit_to: str, context: str | None):
+    from cet_units import Q
+
+    return Q(q_from).to(unit_to, context) if context else Q(q_from).to(unit_to)
+
+
+def convert_stream(file_in, file_out, fmt: str, context: str | None):
+    # Convert records one by one, writing each result once it is available.
+    n_errors = 0
+    if fmt == "lines":
+        parser = FromToParser(
+            prog="units_convert --batch", exit_on_error=False
+        )
+        records = (
+            (i, line)
+            for i, line in enumerate(file_in, start=1)
+            if line.strip() and not line.lstrip().startswith("#")
+        )
+        for i, line in records:
+            try:
+                args = parser.parse_args(shlex.split(line))
+                q_out = convert_quantity(
+                    args.unit_from, args.unit_to, args.context or context
+                )
+            except Exception as e:
+                print(f"line {i}: {e}", file=sys.stderr)
+                print(file=file_out, flush=True)
+                n_errors += 1
+            else:
+                print(q_out, file=file_out, flush=True)
+    elif fmt == "csv":
+        reader = csv.DictReader(file_in)
+        writer = csv.DictWriter(
+            file_out, fieldnames=[*(reader.fieldnames or []), "result"]
+        )
+        writer.writeheader()
+        for i, record in enumerate(reader, start=2):
+            try:
+                record["result"] = str(
+                    convert_quantity(
+                        record["from"],
+                        record["to"],
+                        record.get("context") or context,
+                    )
+                )
+            except Exception as e:
+                print(f"line {i}: {e}", file=sys.stderr)
+                record["result"] = ""
+                n_errors += 1
+            writer.writerow(record)
+            file_out.flush()
+    else:
+        for i, line in enumerate(file_in, start=1):
+            if not line.strip():
+                continue
+            record = None
+            try:
+                record = json.loads(line)
+                record["result"] = str(
+                    convert_quantity(
+                        record["from"],
+                        record["to"],
+                        record.get("context") or context,
+                    )
+                )
+            except Exception as e:
+                print(f"line {i}: {e}", file=sys.stderr)
+                # Keep the fields of valid records, like rows of tables.
+                if not isinstance(record, dict):
+                    record = {}
+                record["error"] = str(e)
+                n_errors += 1
+            print(json.dumps(record), file=file_out, flush=True)
+    return n_errors
+
+
+def convert_batch(arg_strings: list[str]):
+    # Create parser.
+    parser = ArgumentParser(
+        prog="units_convert --batch",
+        description="Potsdam units converter (batch mode)",
+        epilog="Reads one conversion per line as 'from X to Y [--context C]' "
+        "(lines), or records with fields 'from', 'to' and optionally "
+        "'context' (csv, jsonl).",
+    )
+    parser.add_argument(
+        "file",
+        nargs="?",
+        type=FileType("r"),
+        default=sys.stdin,
+        help="file to read from (default: stdin)",
+    )
+    parser.add_argument(
+        "--format",
+        choices=["lines", "csv", "jsonl"],
+        default="lines",
+        help="format of the input and output (default: lines)",
+    )
+    parser.add_argument(
+        "--context",
+        default=None,
+        help="context used for records that do not specify one",
+    )
+
+    # Parse the arguments.
+    args = parser.parse_args(arg_strings)
+
+    # Convert quantities.
+    with args.file as file_in:
+        n_errors = convert_stream(
+            file_in, sys.stdout, args.format, args.context
+        )
+    if n_errors:
+        sys.exit(1)
+
+
+def convert_serve(arg_strings: list[str]):
+    # Create parser.
+    parser = ArgumentParser(
+        prog="units_convert --serve",
+        description="Potsdam units converter (server mode)",
+        epilog="While the server is running, 'units-convert from X to Y' "
+        "forwards conversions to it instead of loading the registry.",
+    )
+    parser.add_argument(
+        "--socket",
+        type=Path,
+        default=default_socket_path(),
+        help="path of the socket to listen on (default: $CET_UNITS_SOCKET "
+        "or a socket in the user cache folder)",
+    )
+
+    # Parse the arguments and serve.
+    args = parser.parse_args(arg_strings)
+    serve(args.socket)
+
+
+def load_search_index():
+    # Fall back to indexing the registry if no index was generated.
+    index = SearchIndex.load(UNIT_DEFS_PATH)
+    if index is None:
+        from cet_units import ureg
+
+        index = SearchIndex.from_registry(ureg)
+    return index
+
+
+def suggest(unit_from: str, unit_to: str, context: str | None) -> list[str]:
+    index = load_search_index()
+    hints = []
+    names = UNIT_NAME_PATTERN.findall(f"{unit_from} {unit_to}")
+    for name in dict.fromkeys(names):
+        if not index.is_unit(name):
+            suggestions = index.suggest(name)
+            if suggestions:
+                hints.append(
+                    f"unknown unit '{name}', did you mean: "
+                    f"{', '.join(suggestions)}?"
+                )
+    if context and context not in dict(index.names("contexts")):
+        suggestions = [m.name for m in index.search(context, ("contexts",), 3)]
+        if suggestions:
+            hints.append(
+                f"unknown context '{context}', did you mean: "
+                f"{', '.join(suggestions)}?"
+            )
+    return hints
+
+
+def print_table(rows: list[tuple[str, ...]]):
+    # Align columns, leaving the last one unpadded.
+    widths = [max(map(len, col)) for col in zip(*rows, strict=True)]
+    try:
+        for row in rows:
+            cells = [cell.ljust(w) for cell, w in zip(row[:-1], widths)]
+            print("  ".join([*cells, row[-1]]).rstrip())
+        sys.stdout.flush()
+    except BrokenPipeError:
+        # Stop quietly if the reader closed the pipe, e.g. `head`, and keep
+        # Python from failing again when flushing stdout on exit.
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(1)
+
+
+def convert_list(arg_strings: list[str]):
+    # Create parser.
+    parser = ArgumentParser(
+        prog="units_convert --list",
+        description="Potsdam units converter (list names)",
+    )
+    parser.add_argument("kind", choices=KINDS, help="kind of names to list")
+
+    # Parse the arguments and print names.
+    args = parser.parse_args(arg_strings)
+    print_table(load_search_index().names(args.kind))
+
+
+def convert_search(arg_strings: list[str]):
+    # Create parser.
+    parser = ArgumentParser(
+        prog="units_convert --search",
+        description="Potsdam units converter (search names)",
+        epilog="Names are matched by prefix and by similarity, ignoring case, "
+        "spaces and underscores. Prefixed units are matched exactly.",
+    )
+    parser.add_argument("query", nargs="+", help="name or part of it")
+    parser.add_argument(
+        "--kind",
+        choices=KINDS,
+        action="append",
+        help="kind of names to search (default: all, can be repeated)",
+    )
+    parser.add_argument(
+        "--limit",
+        type=int,
+        default=10,
+        help="maximum number of matches (default: 10)",
+    )
+
+    # Parse the arguments and print matches.
+    args = parser.parse_args(arg_strings)
+    matches = load_search_index().search(
+        " ".join(args.query), tuple(args.kind or KINDS), args.limit
+    )
+    if not matches:
+        sys.exit("no matches")
+    print_table(
+        [
+            (
+                m.term,
+                m.kind,
+                m.name if m.name != m.term else "",
+                m.info,
+            )
+            for m in matches
+        ]
+    )
+
+
+def convert():
+    # Create parser.
+    parser = FromToParser(
+        prog="units_convert",
+        description="Potsdam units converter",
+        epilog="For further details, please consult the code documentation or "
+        "source code.",
+    )
+
+    # Use batch, server, list or search mode if requested.
+    if sys.argv[1:2] == ["--batch"]:
+        convert_batch(sys.argv[2:])
+        return
+    if sys.argv[1:2] == ["--serve"]:
+        convert_serve(sys.argv[2:])
+        return
+    if sys.argv[1:2] == ["--list"]:
+        convert_list(sys.argv[2:])
+        return
+    if sys.argv[1:2] == ["--search"]:
+        convert_search(sys.argv[2:])
+        return
+
+    # Parse the arguments.
+    args = parser.parse_args(sys.argv[1:])
+
+    # Convert quantities via the server if running, otherwise in-process.
+    response = request(
+        default_socket_path(),
+        {"from": args.unit_from, "to": args.unit_to, "context": args.context},
+    )
+    if response is None:
+        try:
+            response = {
+                "result": convert_quantity(
+                    args.unit_from, args.unit_to, args.context
+                )
+            }
+        except Exception as e:
+            response = {"error": str(e)}
+    if "error" in response:
+        # Suggest the closest names for unknown units and contexts.
+        hints = suggest(args.unit_from, args.unit_to, args.context)
+        sys.exit("\n".join([f"error: {response['error']}", *hints]))
+    q_out = response["result"]
+
+    # Print output.
+    print(q_out)
@@ -0,0 +1,424 @@
+"""Search the names of units, flows, species, currencies and contexts."""
+
+import json
+from bisect import bisect_left
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from re import compile as re_compile
+from typing import NamedTuple
+
+# Path to the unit definitions of CET Units, found relative to this module, so
+# that the search index can be loaded without importing CET Units.
+UNIT_DEFS_PATH = Path(__file__).parents[1] / "cet_units" / "unit_definitions"
+
+# Name of the search index file in the generated definitions folder.
+SEARCH_FILE = "search.json"
+
+# Version of the search index format. Increase when the layout changes.
+SEARCH_FORMAT = 1
+
+# Kinds of names in the search index.
+KINDS = ("units", "flows", "species", "currencies", "contexts")
+
+# Minimum similarity of names matching a query only by their trigrams.
+MIN_SIMILARITY = 0.3
+
+# Separators that are ignored when matching names, e.g. in `MWh NG HHV`.
+_SEPARATORS = re_compile(r"[\s_]+")
+
+
+class Match(NamedTuple):
+    """Name matching a search query.
+
+    Attributes
+    ----------
+    kind : str
+        Kind of the name, e.g. `"units"`.
+    name : str
+        Canonical name, e.g. `"watt_hour_H2_LHV"`.
+    term : str
+        The name, symbol or alias that matched the query, e.g. `"Wh_H2_LHV"`.
+    info : str
+        Short description, e.g. the dimensionality of a unit.
+    score : float
+        Score of the match. Exact matches score 2 or more, matches by prefix
+        between 1 and 2, and matches by trigrams less than 1.
+
+    """
+
+    kind: str
+    name: str
+    term: str
+    info: str
+    score: float
+
+
+def _normalize(s: str) -> str:
+    return _SEPARATORS.sub("_", s.strip().lower())
+
+
+def _trigrams(s: str) -> set[str]:
+    s = f"  {s} "
+    return {s[i : i + 3] for i in range(len(s) - 2)}
+
+
+@dataclass
+class SearchIndex:
+    """Index of the names of units, flows, species, currencies and contexts.
+
+    The index is generated by `units-generate` next to the generated unit
+    definitions, so that names can be listed and searched without building
+    the registry.
+
+    Attributes
+    ----------
+    entries : dict[str, list[list[str]]]
+        Pairs of canonical names and short descriptions by kind.
+    terms : list[list]
+        Names, symbols and aliases with the index of their kind and entry,
+        sorted by their normalized form for finding them by prefix.
+    trigrams : dict[str, list[int]]
+        Indices of the terms containing each trigram of normalized terms.
+    prefixes : dict[str, str]
+        Names of unit prefixes by name and symbol, longest first.
+
+    """
+
+    entries: dict = field(default_factory=dict)
+    terms: list = field(default_factory=list)
+    trigrams: dict = field(default_factory=dict)
+    prefixes: dict = field(default_factory=dict)
+
+    def __post_init__(self):  # noqa: D105
+        self._keys = [_normalize(term) for term, _, _ in self.terms]
+        self._known = {term for term, _, _ in self.terms}
+
+    @classmethod
+    def from_names(
+        cls,
+        names: dict[str, list[tuple[str, str, list[str]]]],
+        prefixes: dict[str, str],
+    ) -> "SearchIndex":
+        """Create index from names.
+
+        Parameters
+        ----------
+        names : dict[str, list[tuple[str, str, list[str]]]]
+            Canonical names, short descriptions and other terms (symbols and
+            aliases) by kind.
+        prefixes : dict[str, str]
+            Names of unit prefixes by name and symbol.
+
+        """
+        entries = {}
+        terms = set()
+        for kind in KINDS:
+            items = sorted(names.get(kind, []))
+            entries[kind] = [[name, info] for name, info, _ in items]
+            for i, (name, _, others) in enumerate(items):
+                k = KINDS.index(kind)
+                terms.update((term, k, i) for term in {name, *others} if term)
+        terms = [
+            list(t) for t in sorted(terms, key=lambda t: (_normalize(t[0]), t))
+        ]
+        trigrams = {}
+        for i, (term, _, _) in enumerate(terms):
+            for trigram in _trigrams(_normalize(term)):
+                trigrams.setdefault(trigram, []).append(i)
+        return cls(
+            entries,
+            terms,
+            dict(sorted(trigrams.items())),
+            {
+                p: prefixes[p]
+                for p in sorted(prefixes, key=lambda p: (-len(p), p))
+            },
+        )
+
+    @classmethod
+    def from_registry(cls, ureg) -> "SearchIndex":
+        """Create index from a registry.
+
+        All stored flows and currency units are defined in the registry
+        first, and all assessment contexts are loaded.
+
+        Parameters
+        ----------
+        ureg : CETUnitRegistry
+            Registry with the CET unit definitions set up.
+
+        """
+        from pint.errors import UndefinedUnitError
+
+        ureg.define_flows(ureg.stored_flows)
+        ureg._define_currency_units(ureg._currency_defs)
+
+        units = {}
+        for definition in ureg._units.values():
+            if definition.name in units:
+                continue
+            try:
+                info = str(ureg.get_dimensionality(definition.name))
+            except UndefinedUnitError:
+                # Skip units referring to undefined units.
+                continue
+            units[definition.name] = (
+                definition.name,
+                info,
+                [definition.defined_symbol, *definition.aliases],
+            )
+
+        flows = []
+        for flow_id in ureg.stored_flows:
+            dimensions = {}
+            for variant, units_by_dim in ureg.flow_units(flow_id).items():
+                for dimension in units_by_dim:
+                    dimensions.setdefault(dimension, set()).add(variant)
+            info = ", ".join(
+                f"{dimension} ({', '.join(sorted(variants - {''}))})"
+                if variants - {""}
+                else dimension
+                for dimension, variants in sorted(dimensions.items())
+            )
+            flows.append((flow_id, info, []))
+
+        species = []
+        for name in ["CO2", *ureg.species]:
+            try:
+                contexts = ureg.species_contexts(name)
+            except ValueError:
+                contexts = []
+            species.append((name, f"{len(contexts)} assessments", []))
+
+        currencies = []
+        for name in ureg.currencies:
+            years = ureg.currency_years(name)
+            info = f"{years[0]}-{years[-1]}" if years else ""
+            currencies.append((name, info, []))
+
+        contexts = [
+            (name, "assessment" if name in ureg.assessments else "", [])
+            for name in ureg.contexts
+        ]
+
+        prefixes = {
+            term: definition.name
+            for definition in ureg._prefixes.values()
+            for term in (definition.name, definition.defined_symbol)
+            if term
+        }
+
+        return cls.from_names(
+            {
+                "units": list(units.values()),
+                "flows": flows,
+                "species": species,
+                "currencies": currencies,
+                "contexts": contexts,
+            },
+            prefixes,
+        )
+
+    @classmethod
+    def load(cls, unit_defs_path: Path) -> "SearchIndex | None":
+        """Load index generated next to the unit definitions.
+
+        Parameters
+        ----------
+        unit_defs_path : Path
+            Path to the unit definitions directory.
+
+        Returns
+        -------
+        SearchIndex | None
+            The index, or None if it is missing or has another format.
+
+        """
+        fpath = unit_defs_path / "generated" / SEARCH_FILE
+        try:
+            with open(fpath) as file_handle:
+                data = json.load(file_handle)
+        except FileNotFoundError:
+            return None
+        if data.get("format") != SEARCH_FORMAT:
+            return None
+        return cls(
+            data["entries"], data["terms"], data["trigrams"], data["prefixes"]
+        )
+
+    def save(self, fpath: Path):
+        """Save index to file.
+
+        Parameters
+        ----------
+        fpath : Path
+            Path of the file.
+
+        """
+        data = {
+            "format": SEARCH_FORMAT,
+            "entries": self.entries,
+            "terms": self.terms,
+            "trigrams": self.trigrams,
+            "prefixes": self.prefixes,
+        }
+        with open(fpath, "w") as file_handle:
+            json.dump(data, file_handle, separators=(",", ":"))
+            file_handle.write("\n")
+
+    def names(self, kind: str) -> list[tuple[str, str]]:
+        """Return canonical names and short descriptions of a kind.
+
+        Parameters
+        ----------
+        kind : str
+            Kind of names, e.g. `"flows"`.
+
+        """
+        return [tuple(entry) for entry in self.entries[kind]]
+
+    def search(
+        self,
+        query: str,
+        kinds: tuple[str, ...] = KINDS,
+        limit: int | None = 10,
+    ) -> list[Match]:
+        """Search names by exact match, prefix and trigram similarity.
+
+        Case, spaces and underscores are ignored when matching, except that
+        names with the exact same case score higher.
+
+        Parameters
+        ----------
+        query : str
+            Name, symbol or alias to search for, or part of it.
+        kinds : tuple[str, ...], optional
+            Kinds of names to search (default: all).
+        limit : int | None, optional
+            Maximum number of matches to return (default: 10). If None, all
+            matches are returned.
+
+        Returns
+        -------
+        list[Match]
+            Best match of each matching name, best matches first.
+
+        """
+        key = _normalize(query)
+        if not key:
+            return []
+        scores = {}
+
+        # Find terms starting with the query.
+        i = bisect_left(self._keys, key)
+        while i < len(self._keys) and self._keys[i].startswith(key):
+            scores[i] = (
+                2.0 + (self.terms[i][0] == query.strip())
+                if self._keys[i] == key
+                else 1.0 + len(key) / len(self._keys[i])
+            )
+            i += 1
+
+        # Find terms with similar trigrams.
+        trigrams = _trigrams(key)
+        counts = Counter(
+            i for trigram in trigrams for i in self.trigrams.get(trigram, ())
+        )
+        for i, count in counts.items():
+            if i in scores:
+                continue
+            similarity = (
+                2 * count / (len(trigrams) + len(_trigrams(self._keys[i])))
+            )
+            if similarity >= MIN_SIMILARITY:
+                scores[i] = similarity
+
+        # Keep best match of each name.
+        matches = {}
+        for i, score in scores.items():
+            term, k, j = self.terms[i]
+            kind = KINDS[k]
+            if kind not in kinds:
+                continue
+            if (k, j) not in matches or score > matches[k, j].score:
+                name, info = self.entries[kind][j]
+                matches[k, j] = Match(kind, name, term, info, score)
+
+        # Find units matching the query exactly after removing a prefix.
+        if "units" in kinds:
+            k = KINDS.index("units")
+            unprefixed = self._unprefixed(_SEPARATORS.sub("_", query.strip()))
+            for prefix, rest in unprefixed[1:]:
+                for term, _, j in self._find(rest, k):
+                    name, info = self.entries["units"][j]
+                    name = self.prefixes[prefix] + name
+                    matches[name] = Match(
+                        "units", name, prefix + term, info, 3.0
+                    )
+        return sorted(
+            matches.values(), key=lambda m: (-m.score, len(m.term), m.name)
+        )[:limit]
+
+    def is_unit(self, name: str) -> bool:
+        """Check if a name refers to a unit, possibly prefixed or plural.
+
+        Parameters
+        ----------
+        name : str
+            Name, symbol or alias of a unit or species.
+
+        """
+        return any(
+            term in self._known
+            or (term.endswith("s") and term[:-1] in self._known)
+            for _, term in self._unprefixed(name)
+        )
+
+    def suggest(self, name: str, limit: int = 3) -> list[str]:
+        """Suggest units close to an unknown name.
+
+        Prefixes are kept, e.g. `kWh_H2_LHV` is suggested for `kWh_H2_HLV`.
+
+        Parameters
+        ----------
+        name : str
+            Name of a unit that is not defined.
+        limit : int, optional
+            Maximum number of suggestions (default: 3).
+
+        Returns
+        -------
+        list[str]
+            Names, symbols or aliases of units, closest first.
+
+        """
+        scores = {}
+        for prefix, term in self._unprefixed(name):
+            for match in self.search(term, ("units", "species"), None):
+                suggestion = prefix + match.term
+                scores[suggestion] = max(
+                    scores.get(suggestion, 0.0), match.score
+                )
+        return sorted(scores, key=lambda s: (-scores[s], len(s), s))[:limit]
+
+    def _unprefixed(self, name: str) -> list[tuple[str, str]]:
+        """Split name into each matching prefix and the rest."""
+        return [("", name)] + [
+            (prefix, name[len(prefix) :])
+            for prefix in self.prefixes
+            if name.startswith(prefix) and len(name) > len(prefix)
+        ]
+
+    def _find(self, term: str, k: int) -> list[list]:
+        """Return terms of a kind equal to a term."""
+        if term not in self._known:
+            return []
+        key = _normalize(term)
+        i = bisect_left(self._keys, key)
+        found = []
+        while i < len(self._keys) and self._keys[i] == key:
+            if self.terms[i][0] == term and self.terms[i][1] == k:
+                found.append(self.terms[i])
+            i += 1
+        return found
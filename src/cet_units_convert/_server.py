@@ -0,0 +1,107 @@
+"""Serve conversions from a warm registry via a Unix domain socket."""
+
+import json
+import os
+import signal
+import socket
+import socketserver
+import sys
+from pathlib import Path
+
+# Maximum time in seconds a client waits for the server.
+CLIENT_TIMEOUT = 10.0
+
+
+def default_socket_path() -> Path:
+    """Return path of socket from environment or in user cache folder."""
+    if "CET_UNITS_SOCKET" in os.environ:
+        return Path(os.environ["CET_UNITS_SOCKET"])
+    from platformdirs import user_cache_path
+
+    return user_cache_path(appname="cet_units", appauthor=False) / (
+        "units-convert.sock"
+    )
+
+
+def convert_record(record: dict) -> dict:
+    """Convert record with fields `from`, `to` and optionally `context`."""
+    from ._cli import convert_quantity
+
+    q_out = convert_quantity(
+        record["from"], record["to"], record.get("context")
+    )
+    return {"result": str(q_out)}
+
+
+class ConversionHandler(socketserver.StreamRequestHandler):
+    """Handle a client connection, converting one JSON record per line."""
+
+    def handle(self):  # noqa: D102
+        for line in self.rfile:
+            try:
+                response = convert_record(json.loads(line))
+            except Exception as e:
+                response = {"error": str(e)}
+            self.wfile.write(json.dumps(response).encode() + b"\n")
+            self.wfile.flush()
+
+
+def serve(socket_path: Path):
+    """Serve conversions until interrupted.
+
+    The registry is frozen before serving, loading all contexts and stored
+    flows. Clients are handled in separate threads converting concurrently.
+
+    Parameters
+    ----------
+    socket_path : Path
+        Path of the Unix domain socket to listen on.
+
+    """
+    from cet_units import ureg
+
+    ureg.freeze()
+
+    socket_path.parent.mkdir(parents=True, exist_ok=True)
+    socket_path.unlink(missing_ok=True)
+    server = socketserver.ThreadingUnixStreamServer(
+        str(socket_path), ConversionHandler
+    )
+    server.daemon_threads = True
+
+    # Shut down cleanly when terminated, removing the socket.
+    signal.signal(signal.SIGTERM, lambda *args: sys.exit(0))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        socket_path.unlink(missing_ok=True)
+
+
+def request(socket_path: Path, record: dict) -> dict | None:
+    """Send record to server and return response, or None if not running.
+
+    Parameters
+    ----------
+    socket_path : Path
+        Path of the Unix domain socket the server listens on.
+    record : dict
+        Record with fields `from`, `to` and optionally `context`.
+
+    """
+    if not hasattr(socket, "AF_UNIX") or not socket_path.exists():
+        return None
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(CLIENT_TIMEOUT)
+            sock.connect(str(socket_path))
+            sock.sendall(json.dumps(record).encode() + b"\n")
+            with sock.makefile("rb") as file_handle:
+                line = file_handle.readline()
+    except OSError:
+        return None
+    if not line:
+        return None
+    return json.loads(line)
@@ -1,9 +1,14 @@
 import argparse
+import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
-from ._currencies import generate_units_currencies
-from ._emissions import generate_units_emissions
-from ._flows import generate_units_flows
+from ._compiled import compiled_inputs, generate_compiled
+from ._currencies import currencies_inputs, generate_units_currencies
+from ._emissions import emissions_inputs, generate_units_emissions
+from ._flows import flows_inputs, generate_units_flows
+from ._manifest import Manifest
+from ._search import generate_search, search_inputs
 
 # Get default path to unit definitions.
 UNIT_DEFS_PATH_DEFAULT = (
@@ -24,6 +29,26 @@ def generate():
         "Will try to determine data path of units package if no other "
         "path is provided.",
     )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of threads calling pydeflate for currencies "
+        "concurrently, while emissions and flows are generated (default: 1).",
+    )
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="Only report definitions whose inputs changed, without "
+        "writing anything. Exits with status 1 if any are stale.",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Regenerate all definitions, even if their inputs did not "
+        "change.",
+    )
     args = parser.parse_args()
 
     # Check that directory exists.
@@ -31,6 +56,75 @@ def generate():
     if not unit_defs_path.is_dir():
         raise NotADirectoryError(f"Not a directory: {unit_defs_path}")
 
-    generate_units_currencies(unit_defs_path)
-    generate_units_emissions(unit_defs_path)
-    generate_units_flows(unit_defs_path)
+    # Load manifest of previously generated definitions.
+    manifest = Manifest.load(unit_defs_path)
+    if args.check:
+        stale = stale_targets(manifest)
+        for target in stale:
+            print(f"Stale: {target}")
+        sys.exit(1 if stale else 0)
+    if args.force:
+        manifest = Manifest(unit_defs_path)
+
+    # Save manifest also if generating fails, as it only records targets
+    # that were generated completely.
+    try:
+        generate_all(unit_defs_path, args.jobs, manifest)
+    finally:
+        manifest.save()
+
+
+def generate_all(unit_defs_path: Path, jobs: int, manifest: Manifest):
+    """Generate stale definitions, possibly concurrently."""
+    if jobs <= 1:
+        generate_units_currencies(unit_defs_path, manifest=manifest)
+        generate_units_emissions(unit_defs_path, manifest)
+        generate_units_flows(unit_defs_path, manifest)
+    else:
+        _generate_concurrently(unit_defs_path, jobs, manifest)
+
+    # Compile definitions and index their names once all text definitions
+    # are generated.
+    generate_compiled(unit_defs_path, manifest)
+    generate_search(unit_defs_path, manifest)
+
+
+def _generate_concurrently(
+    unit_defs_path: Path, jobs: int, manifest: Manifest
+):
+    # Run the generators concurrently, so that generating emissions and
+    # flows, which is CPU-bound, overlaps with the downloads of pydeflate for
+    # currencies, which are run on a pool of their own. The generators run in
+    # a separate pool, so that they cannot block the workers while waiting
+    # for results.
+    with (
+        ThreadPoolExecutor(jobs) as executor,
+        ThreadPoolExecutor(3) as generators,
+    ):
+        futures = [
+            generators.submit(
+                generate_units_currencies, unit_defs_path, executor, manifest
+            ),
+            generators.submit(
+                generate_units_emissions, unit_defs_path, manifest
+            ),
+            generators.submit(generate_units_flows, unit_defs_path, manifest),
+        ]
+        for future in futures:
+            future.result()
+
+
+def stale_targets(manifest: Manifest) -> list[str]:
+    """Return targets whose inputs changed or whose data was removed."""
+    inputs = {
+        "currencies": currencies_inputs(),
+        "emissions": emissions_inputs(),
+        **flows_inputs(),
+        "compiled": compiled_inputs(manifest.path),
+        "search": search_inputs(manifest.path),
+    }
+    return [
+        target
+        for target, target_inputs in inputs.items()
+        if manifest.is_stale(target, target_inputs)
+    ] + [target for target in manifest.entries if target not in inputs]
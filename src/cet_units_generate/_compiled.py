@@ -0,0 +1,44 @@
+"""Generate compiled unit definitions from the text definitions."""
+
+from pathlib import Path
+
+import pint
+
+from cet_units._compiled import (
+    COMPILED_FILE,
+    compile_definitions,
+    source_hash,
+)
+
+from ._manifest import Manifest, hash_inputs
+
+
+def compiled_inputs(p: Path) -> str:
+    """Return hash of the inputs of the compiled definitions."""
+    return hash_inputs(pint.__version__, source_hash(p.parent))
+
+
+def generate_compiled(p: Path, manifest: Manifest | None = None):
+    """Generate compiled unit definitions.
+
+    The definitions are compiled from the text definitions in the parent
+    directory, so this must run after all other definitions are generated.
+
+    Parameters
+    ----------
+    p : Path
+        Path to the directory where the unit definitions should be stored.
+    manifest : Manifest | None, optional
+        Manifest of the generated definitions. If provided, definitions are
+        only compiled if their inputs changed, and recorded in it.
+
+    """
+    inputs = compiled_inputs(p)
+    if manifest is not None and not manifest.is_stale("compiled", inputs):
+        return
+
+    fpath = p / COMPILED_FILE
+    fpath.write_bytes(compile_definitions(p.parent))
+
+    if manifest is not None:
+        manifest.record("compiled", inputs, [fpath])
@@ -1,12 +1,15 @@
 """Generate unit definitions for currencies."""
 
+from concurrent.futures import Executor, Future
 from datetime import datetime
+from importlib.metadata import version
 from pathlib import Path
 
 import pandas as pd
 from pydeflate import deflate, set_pydeflate_path
 
 from . import FILE_HEADER
+from ._manifest import Manifest, hash_inputs
 
 # Define the currencies and the country GDPs used for conversion.
 currencies = {
@@ -21,25 +24,56 @@ currencies = {
 }
 
 
-def generate_units_currencies(p: Path):
+def currencies_inputs() -> str:
+    """Return hash of the inputs of the currency definitions.
+
+    The data downloaded by pydeflate is identified by the version of
+    pydeflate and the base year, as its vintage cannot be determined without
+    downloading it.
+    """
+    return hash_inputs(
+        FILE_HEADER, currencies, version("pydeflate"), _base_year()
+    )
+
+
+def _base_year() -> int:
+    # Define this year and the previous. The currencies will be defined up to
+    # and including the last year's.
+    this_year = datetime.now().year
+    return this_year - 2
+
+
+def generate_units_currencies(
+    p: Path,
+    executor: Executor | None = None,
+    manifest: Manifest | None = None,
+):
     """Generate unit definitions for currencies.
 
     Parameters
     ----------
     p : Path
         Path to the directory where the unit definitions should be stored.
+    executor : Executor | None, optional
+        Executor to run the calls of pydeflate for each currency on
+        concurrently once its data is downloaded. If None (default), they are
+        run one after another.
+    manifest : Manifest | None, optional
+        Manifest of the generated definitions. If provided, definitions are
+        only generated if their inputs changed, and recorded in it.
 
     """
+    inputs = currencies_inputs()
+    if manifest is not None and not manifest.is_stale("currencies", inputs):
+        return
+
     # Create currencies subdirectory.
     (p / "currencies").mkdir(exist_ok=True)
 
     # Define place for pydeflate to save its cache files.
     set_pydeflate_path(Path(__file__).parent)
 
-    # Define this year and the previous. The currencies will be defined up to
-    # and including the last year's.
-    this_year = datetime.now().year
-    base_year = this_year - 2
+    base_year = _base_year()
 
     # Define the base currency as the first currency in the list above. All
     # currencies will be converted to the base currency via exchange rates.
@@ -49,102 +83,158 @@ def generate_units_currencies(p: Path):
     with open(p / "currencies" / "currencies.txt", "w") as file_handle:
         file_handle.write("\n".join(list(currencies)) + "\n")
 
+    # Generate the deflators of the base currency first, so that pydeflate
+    # downloads its data into its cache once rather than in concurrent calls,
+    # which do not lock the cache.
+    base_deflators = _run(
+        _generate_deflators,
+        base_currency,
+        currencies[base_currency],
+        base_year,
+    )
+
+    # Generate exchange rates and deflators of the other currencies, possibly
+    # concurrently. Results are collected in order, so that files are
+    # identical to those of serial runs.
+    submit = executor.submit if executor is not None else _run
+    tasks = {
+        currency: (
+            submit(
+                _generate_exchange_rate,
+                currency,
+                country,
+                base_currency,
+                base_year,
+            ),
+            base_deflators
+            if currency == base_currency
+            else submit(_generate_deflators, currency, country, base_year),
+        )
+        for currency, country in currencies.items()
+    }
+
+    # Wait for all results before writing, so that no files are left
+    # incomplete if pydeflate fails.
+    defs = {
+        currency: exchange.result() + deflators.result()
+        for currency, (exchange, deflators) in tasks.items()
+    }
+
     # Define units.
-    for currency, country in currencies.items():
+    for currency, currency_defs in defs.items():
         with open(p / "currencies" / f"{currency}.txt", "w") as file_handle:
             file_handle.write(FILE_HEADER)
-
-            # Define currency dimension if base currency. Otherwise use
-            # pydeflate to generate exchange rate to base currency.
-            if currency == base_currency:
-                file_handle.write(f"{currency}_{base_year} = [currency]\n\n")
-            else:
-                # Create an empty dataframe that pydeflate will fill with a
-                # conversion factor.
-                df = pd.DataFrame.from_dict(
-                    {
-                        "iso_code": [country],
-                        "period": [base_year],
-                        "value": [1.0],
-                    }
-                )
-
-                # Call pydeflate to generate exchange rates.
-                exchange_rates = deflate(
-                    df=df,
-                    base_year=base_year,
-                    deflator_source="imf",
-                    deflator_method="gdp",
-                    exchange_source="imf",
-                    exchange_method=None,
-                    source_currency="LCU",  # Local currency unit.
-                    target_currency=base_currency,  # Target is base currency.
-                    id_column="iso_code",
-                    id_type="ISO3",
-                    date_column="period",
-                    source_column="value",  # Where to find original data.
-                    target_column="conv_factor",  # Where to store new data.
-                ).astype({"period": "str"})
-
-                fstr = (
-                    f"{currency}_{{period}} = "
-                    f"{base_currency}_{base_year} * "
-                    f"{{conv_factor}}\n\n"
+            file_handle.write(currency_defs)
+
+    if manifest is not None:
+        manifest.record(
+            "currencies",
+            inputs,
+            [p / "currencies" / "currencies.txt"]
+            + [p / "currencies" / f"{c}.txt" for c in currencies],
+        )
+
+
+def _generate_exchange_rate(
+    currency: str, country: str, base_currency: str, base_year: int
+) -> str:
+    """Generate definition of the base-year unit of a currency."""
+    # Define currency dimension if base currency. Otherwise use pydeflate to
+    # generate exchange rate to base currency.
+    if currency == base_currency:
+        return f"{currency}_{base_year} = [currency]\n\n"
+
+    # Create an empty dataframe that pydeflate will fill with a conversion
+    # factor.
+    df = pd.DataFrame.from_dict(
+        {
+            "iso_code": [country],
+            "period": [base_year],
+            "value": [1.0],
+        }
+    )
+
+    # Call pydeflate to generate exchange rates.
+    exchange_rates = deflate(
+        df=df,
+        base_year=base_year,
+        deflator_source="imf",
+        deflator_method="gdp",
+        exchange_source="imf",
+        exchange_method=None,
+        source_currency="LCU",  # Local currency unit.
+        target_currency=base_currency,  # Target is base currency.
+        id_column="iso_code",
+        id_type="ISO3",
+        date_column="period",
+        source_column="value",  # Where to find original data.
+        target_column="conv_factor",  # Where to store new data.
+    ).astype({"period": "str"})
+
+    fstr = (
+        f"{currency}_{{period}} = "
+        f"{base_currency}_{base_year} * "
+        f"{{conv_factor}}\n\n"
+    )
+    return fstr.format(**exchange_rates.iloc[0].to_dict())
+
+
+def _generate_deflators(currency: str, country: str, base_year: int) -> str:
+    """Generate definitions of the units of a currency in other years."""
+    # Create an empty dataframe that pydeflate will fill with conversion
+    # factors.
+    df = pd.DataFrame.from_dict(
+        {
+            "iso_code": country,
+            "period": range(1995, base_year),
+            "value": 1.0,
+        }
+    )
+
+    # Call pydeflate to generate deflators.
+    deflators = deflate(
+        df=df,
+        base_year=base_year,
+        deflator_source="imf",
+        deflator_method="gdp",
+        exchange_source="imf",
+        exchange_method=None,
+        source_currency=currency,
+        target_currency=currency,
+        id_column="iso_code",
+        id_type="ISO3",
+        date_column="period",
+        source_column="value",  # Where to find original data.
+        target_column="conv_factor",  # Where to store new data.
+    ).astype({"period": "str"})
+
+    # Remove rows where conv_factor is missing or marked as 'n/a'. This
+    # prevents writing `n/a`, `<NA>` or similar entries for years without
+    # data (e.g., EUR has no data before 1999) so those years are omitted.
+    deflators = deflators.loc[
+        deflators["conv_factor"].apply(
+            lambda x: (
+                not (
+                    pd.isna(x)
+                    or str(x).strip().lower().strip("<>")
+                    in {"n/a", "na", "nan", ""}
                 )
-                exchange = fstr.format(**exchange_rates.iloc[0].to_dict())
-                file_handle.write(exchange)
-
-            # Create an empty dataframe that pydeflate will fill with
-            # conversion factors.
-            df = pd.DataFrame.from_dict(
-                {
-                    "iso_code": country,
-                    "period": range(1995, base_year),
-                    "value": 1.0,
-                }
-            )
-
-            # Call pydeflate to generate deflators.
-            deflators = deflate(
-                df=df,
-                base_year=base_year,
-                deflator_source="imf",
-                deflator_method="gdp",
-                exchange_source="imf",
-                exchange_method=None,
-                source_currency=currency,
-                target_currency=currency,
-                id_column="iso_code",
-                id_type="ISO3",
-                date_column="period",
-                source_column="value",  # Where to find original data.
-                target_column="conv_factor",  # Where to store new data.
-            ).astype({"period": "str"})
-
-            # Remove rows where conv_factor is missing or marked as 'n/a'.
-            # This prevents writing `n/a`, `<NA>` or similar entries for years
-            # without data (e.g., EUR has no data before 1999) so those years
-            # are omitted.
-            deflators = deflators.loc[
-                deflators["conv_factor"].apply(
-                    lambda x: (
-                        not (
-                            pd.isna(x)
-                            or str(x).strip().lower().strip("<>")
-                            in {"n/a", "na", "nan", ""}
-                        )
-                    )
-                )
-            ]
-
-            # Generate list of rows and dump into definitions file.
-            fstr = (
-                f"{currency}_{{period}} = "
-                f"{currency}_{base_year} * "
-                f"{{conv_factor}}"
             )
-            deflators_list = deflators.apply(
-                lambda row: fstr.format(**row), axis=1
-            ).tolist()
-            if deflators_list:
-                file_handle.write("\n".join(deflators_list) + "\n")
+        )
+    ]
+
+    # Generate list of rows and dump into definitions file.
+    fstr = f"{currency}_{{period}} = {currency}_{base_year} * {{conv_factor}}"
+    deflators_list = deflators.apply(
+        lambda row: fstr.format(**row), axis=1
+    ).tolist()
+    if deflators_list:
+        return "\n".join(deflators_list) + "\n"
+    return ""
+
+
+def _run(func, *args) -> Future:
+    """Run function immediately, returning its result as a future."""
+    future = Future()
+    future.set_result(func(*args))
+    return future
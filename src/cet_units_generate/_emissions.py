@@ -1,11 +1,13 @@
 """Generate unit definitions for greenhouse-gas emissions."""
 
+from importlib.metadata import version
 from pathlib import Path
 from re import sub
 
 import globalwarmingpotentials as gwp
 
 from . import FILE_HEADER
+from ._manifest import Manifest, hash_inputs
 
 GENERIC_DEFS = """
 gram__CO2 = [ghg_emission] = g__CO2
@@ -24,15 +26,29 @@ def _safe_ghg_label(s: str):
     return sub(r"[()-]", r"_", s).strip("_")
 
 
-def generate_units_emissions(p: Path):
+def emissions_inputs() -> str:
+    """Return hash of the inputs of the emissions definitions."""
+    return hash_inputs(
+        FILE_HEADER, GENERIC_DEFS, version("globalwarmingpotentials")
+    )
+
+
+def generate_units_emissions(p: Path, manifest: Manifest | None = None):
     """Generate unit definitions for greenhouse-gas emissions.
 
     Parameters
     ----------
     p : Path
         Path to the directory where the unit definitions should be stored.
+    manifest : Manifest | None, optional
+        Manifest of the generated definitions. If provided, definitions are
+        only generated if their inputs changed, and recorded in it.
 
     """
+    inputs = emissions_inputs()
+    if manifest is not None and not manifest.is_stale("emissions", inputs):
+        return
+
     # Create emissions subdirectory.
     (p / "emissions").mkdir(exist_ok=True)
 
@@ -86,3 +102,14 @@ def generate_units_emissions(p: Path):
     with open(p / "emissions" / "species.txt", "w") as file_handle_species:
         for species_name_safe in all_species:
             file_handle_species.write(species_name_safe + "\n")
+
+    if manifest is not None:
+        manifest.record(
+            "emissions",
+            inputs,
+            [
+                p / "emissions" / "generic.txt",
+                p / "emissions" / "species.txt",
+            ]
+            + [p / "emissions" / f"{a}.txt" for a in gwp.data],
+        )
@@ -4,43 +4,93 @@ from csv import reader as csv_reader
 from pathlib import Path
 from typing import Final
 
+import pint
+
 from cet_units import ureg
+from cet_units.registry import FLOW_EXTEND_UNITS, FLOW_UNIT_VARIANTS
 from cet_units_generate import FILE_HEADER
 
+from ._manifest import Manifest, hash_inputs
+
 FLOWS_DATA_PATH: Final[Path] = Path(__file__).parent / "data" / "flows"
 
 if not FLOWS_DATA_PATH.is_dir():
     raise Exception("Directory containing flow properties could not be found.")
 
 
-def generate_units_flows(p: Path):
+def flows_inputs() -> dict[str, str]:
+    """Return hashes of the inputs of the definitions of each flow.
+
+    The factors of the definitions are computed with pint, so its version is
+    an input, too.
+    """
+    return {
+        f"flows/{flow_path.stem}": hash_inputs(
+            FILE_HEADER,
+            pint.__version__,
+            FLOW_UNIT_VARIANTS,
+            FLOW_EXTEND_UNITS,
+            flow_path.read_bytes(),
+        )
+        for flow_path in sorted(FLOWS_DATA_PATH.glob("*.csv"))
+    }
+
+
+def generate_units_flows(p: Path, manifest: Manifest | None = None):
     """Generate unit definitions for energy flows.
 
     Parameters
     ----------
     p : Path
         Path to the directory where the unit definitions should be stored.
+    manifest : Manifest | None, optional
+        Manifest of the generated definitions. If provided, only definitions
+        of flows whose inputs changed are generated, and recorded in it.
+        Definitions of flows whose data files were removed are deleted.
 
     """
     # Create emissions subdirectory.
     (p / "flows").mkdir(exist_ok=True)
 
+    # Find flows to generate.
+    inputs = flows_inputs()
+    targets = [
+        target
+        for target, target_inputs in inputs.items()
+        if manifest is None or manifest.is_stale(target, target_inputs)
+    ]
+    flow_paths = [
+        FLOWS_DATA_PATH / f"{target.removeprefix('flows/')}.csv"
+        for target in targets
+    ]
+
     # Load flows from files.
-    for flow_path in FLOWS_DATA_PATH.glob("*.csv"):
-        flow_id = flow_path.stem
-
-        with open(flow_path) as file_stream:
-            read = csv_reader(
-                file_stream,
-                delimiter=",",
-                quotechar='"',
-                strict=True,
-            )
-            next(read)  # Skip header line.
-            flow_specs = {row[0]: row[1] for row in read}
-            defs = ureg.generate_units_defs_flow(flow_id, flow_specs)
-
-            # Create generic file.
-            with open(p / "flows" / f"{flow_id}.txt", "w") as file_handle:
-                file_handle.write(FILE_HEADER)
-                file_handle.write(defs)
+    for target, flow_path in zip(targets, flow_paths, strict=True):
+        defs = _generate_flow(flow_path)
+        # Create generic file.
+        fpath = p / "flows" / f"{flow_path.stem}.txt"
+        with open(fpath, "w") as file_handle:
+            file_handle.write(FILE_HEADER)
+            file_handle.write(defs)
+        if manifest is not None:
+            manifest.record(target, inputs[target], [fpath])
+
+    # Remove definitions of flows without data.
+    if manifest is not None:
+        for target in list(manifest.entries):
+            if target.startswith("flows/") and target not in inputs:
+                manifest.remove(target)
+
+
+def _generate_flow(flow_path: Path) -> str:
+    """Generate unit definitions for the flow specified in a file."""
+    with open(flow_path) as file_stream:
+        read = csv_reader(
+            file_stream,
+            delimiter=",",
+            quotechar='"',
+            strict=True,
+        )
+        next(read)  # Skip header line.
+        flow_specs = {row[0]: row[1] for row in read}
+    return ureg.generate_units_defs_flow(flow_path.stem, flow_specs)
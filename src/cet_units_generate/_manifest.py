@@ -0,0 +1,128 @@
+"""Keep track of the inputs and outputs of generated unit definitions."""
+
+import json
+from dataclasses import dataclass, field
+from hashlib import sha256
+from pathlib import Path
+
+# Name of the manifest file in the directory of generated definitions.
+MANIFEST_FILE = "manifest.json"
+
+
+def hash_inputs(*inputs) -> str:
+    """Compute hash of inputs given as bytes or objects with stable repr."""
+    h = sha256()
+    for item in inputs:
+        h.update(item if isinstance(item, bytes) else repr(item).encode())
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def _hash_file(fpath: Path) -> str | None:
+    try:
+        return sha256(fpath.read_bytes()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+
+@dataclass
+class Manifest:
+    """Manifest of the generated unit definitions.
+
+    For each target (e.g. `"currencies"` or `"flows/H2"`), the manifest
+    records the hash of the inputs it was generated from and the hashes of
+    its output files, so that only stale targets need to be regenerated.
+
+    Attributes
+    ----------
+    path : Path
+        Directory of the generated definitions.
+    entries : dict[str, dict]
+        Hash of inputs (`"inputs"`) and hashes of output files by path
+        relative to `path` (`"outputs"`) for each target.
+
+    """
+
+    path: Path
+    entries: dict[str, dict] = field(default_factory=dict)
+
+    @classmethod
+    def load(cls, path: Path) -> "Manifest":
+        """Load manifest from directory, or create empty one if not found.
+
+        Parameters
+        ----------
+        path : Path
+            Directory of the generated definitions.
+
+        """
+        try:
+            with open(path / MANIFEST_FILE) as file_handle:
+                entries = json.load(file_handle)
+        except FileNotFoundError:
+            entries = {}
+        return cls(path, entries)
+
+    def save(self):
+        """Save manifest to directory of generated definitions."""
+        with open(self.path / MANIFEST_FILE, "w") as file_handle:
+            json.dump(self.entries, file_handle, indent=2, sort_keys=True)
+            file_handle.write("\n")
+
+    def is_stale(self, target: str, inputs: str) -> bool:
+        """Check if target must be regenerated.
+
+        A target is stale if it has not been generated before, if its inputs
+        changed, or if any of its output files is missing or was modified.
+
+        Parameters
+        ----------
+        target : str
+            Name of the target.
+        inputs : str
+            Hash of the current inputs of the target.
+
+        """
+        entry = self.entries.get(target)
+        return (
+            entry is None
+            or entry["inputs"] != inputs
+            or any(
+                _hash_file(self.path / output) != output_hash
+                for output, output_hash in entry["outputs"].items()
+            )
+        )
+
+    def record(self, target: str, inputs: str, outputs: list[Path]):
+        """Record inputs and output files of generated target.
+
+        Parameters
+        ----------
+        target : str
+            Name of the target.
+        inputs : str
+            Hash of the inputs the target was generated from.
+        outputs : list[Path]
+            Paths of the output files of the target.
+
+        """
+        self.entries[target] = {
+            "inputs": inputs,
+            "outputs": {
+                fpath.relative_to(self.path).as_posix(): _hash_file(fpath)
+                for fpath in outputs
+            },
+        }
+
+    def remove(self, target: str):
+        """Remove target and its output files.
+
+        Parameters
+        ----------
+        target : str
+            Name of the target.
+
+        """
+        entry = self.entries.pop(target)
+        for output in entry["outputs"]:
+            (self.path / output).unlink(missing_ok=True)
@@ -0,0 +1,56 @@
+"""Generate the index for searching unit names."""
+
+from pathlib import Path
+
+import pint
+
+from cet_units_convert._search import SEARCH_FILE, SEARCH_FORMAT, SearchIndex
+
+from ._manifest import Manifest, hash_inputs
+
+
+def search_inputs(p: Path) -> str:
+    """Return hash of the inputs of the search index."""
+    unit_defs_path = p.parent
+    return hash_inputs(
+        pint.__version__,
+        SEARCH_FORMAT,
+        *(
+            item
+            for fpath in sorted(unit_defs_path.rglob("*.txt"))
+            for item in (
+                fpath.relative_to(unit_defs_path).as_posix(),
+                fpath.read_bytes(),
+            )
+        ),
+    )
+
+
+def generate_search(p: Path, manifest: Manifest | None = None):
+    """Generate index for searching unit names.
+
+    The index is built from a registry with all definitions in the parent
+    directory, including all stored flows, so this must run after all other
+    definitions are generated.
+
+    Parameters
+    ----------
+    p : Path
+        Path to the directory where the unit definitions should be stored.
+    manifest : Manifest | None, optional
+        Manifest of the generated definitions. If provided, the index is only
+        generated if its inputs changed, and recorded in it.
+
+    """
+    from cet_units.registry import CETUnitRegistry
+
+    inputs = search_inputs(p)
+    if manifest is not None and not manifest.is_stale("search", inputs):
+        return
+
+    fpath = p / SEARCH_FILE
+    ureg = CETUnitRegistry.from_unit_defs(p.parent)
+    SearchIndex.from_registry(ureg).save(fpath)
+
+    if manifest is not None:
+        manifest.record("search", inputs, [fpath])
@@ -1,6 +1,7 @@
 """Tests for unit generation."""
 
 import unittest
+from filecmp import dircmp
 from pathlib import Path
 from shutil import rmtree
 
@@ -10,6 +11,8 @@ class TestsGenerate(unittest.TestCase):
 
     def test_generate(self):
         """Test unit generation."""
+        from concurrent.futures import ThreadPoolExecutor
+
         from cet_units_generate._currencies import generate_units_currencies
         from cet_units_generate._emissions import generate_units_emissions
         from cet_units_generate._flows import generate_units_flows
@@ -21,4 +24,51 @@ class TestsGenerate(unittest.TestCase):
         generate_units_emissions(unit_defs_path)
         generate_units_flows(unit_defs_path)
 
+        # Check that concurrent generation yields identical files.
+        unit_defs_path_jobs = Path("./test-generate-tmp-jobs/")
+        unit_defs_path_jobs.mkdir(parents=True, exist_ok=True)
+        with ThreadPoolExecutor(4) as executor:
+            generate_units_currencies(unit_defs_path_jobs, executor)
+        comparison = dircmp(
+            unit_defs_path / "currencies", unit_defs_path_jobs / "currencies"
+        )
+        self.assertEqual(comparison.diff_files, [])
+        self.assertEqual(comparison.left_only, [])
+
         rmtree(unit_defs_path)
+        rmtree(unit_defs_path_jobs)
+
+    def test_manifest(self):
+        """Test regenerating only definitions with changed inputs."""
+        from tempfile import TemporaryDirectory
+
+        from cet_units_generate._emissions import generate_units_emissions
+        from cet_units_generate._flows import (
+            flows_inputs,
+            generate_units_flows,
+        )
+        from cet_units_generate._manifest import Manifest
+
+        with TemporaryDirectory() as tmp:
+            unit_defs_path = Path(tmp)
+            manifest = Manifest(unit_defs_path)
+            generate_units_emissions(unit_defs_path, manifest)
+            generate_units_flows(unit_defs_path, manifest=manifest)
+            manifest.save()
+
+            # Check that unchanged definitions are not written again.
+            fpath = unit_defs_path / "flows" / "H2.txt"
+            mtimes = {
+                f: f.stat().st_mtime_ns for f in unit_defs_path.rglob("*.txt")
+            }
+            fpath.write_text("modified")
+            manifest = Manifest.load(unit_defs_path)
+            inputs = flows_inputs()
+            self.assertTrue(manifest.is_stale("flows/H2", inputs["flows/H2"]))
+            self.assertFalse(manifest.is_stale("flows/NG", inputs["flows/NG"]))
+            generate_units_emissions(unit_defs_path, manifest)
+            generate_units_flows(unit_defs_path, manifest=manifest)
+            for f, mtime in mtimes.items():
+                if f != fpath:
+                    self.assertEqual(f.stat().st_mtime_ns, mtime)
+            self.assertNotEqual(fpath.read_text(), "modified")
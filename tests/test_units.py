@@ -1,6 +1,7 @@
 """Tests for unit definitions."""
 
 import unittest
+from pathlib import Path
 
 
 class TestsDefinitions(unittest.TestCase):
@@ -8,9 +9,14 @@ class TestsDefinitions(unittest.TestCase):
 
     def test_definitions(self):
         """Test definitions."""
-        # Check that importing works without failure.
+        # Check that importing works without failure and sets the
+        # application registry.
+        from pint import get_application_registry
+
         from cet_units import Q, U, ureg
 
+        self.assertIs(get_application_registry().get(), ureg)
+
         # Check that defining flows works without failure.
         ureg.define_flows(["H2", "NG", "NH3", "MeOH"])
 
@@ -20,3 +26,785 @@ class TestsDefinitions(unittest.TestCase):
         # Check that conversion give correct result.
         q = Q("1 USD_2020 / kg_H2").to("EUR_2024 / MWh_H2_LHV")
         self.assertAlmostEqual(q.m, 33.0, places=0)
+
+    def test_species(self):
+        """Test rewriting of species in unit strings."""
+        from cet_units import Q, ureg
+
+        # Check that species are rewritten when parsing and formatting.
+        self.assertEqual(ureg._preprocess("Mt CH4/a"), "Mt__CH4/a")
+        self.assertEqual(ureg._postprocess("Mt__CH4/a"), "Mt CH4/a")
+        self.assertEqual(f"{Q('1 Mt CH4/a')}", "1.0 Mt CH4/a")
+
+        # Check that units formatted once are reused with other magnitudes.
+        q = Q(1.0, "Mt CH4/a")
+        for m in (1.0, 2.5):
+            self.assertEqual(f"{m * q:~.2fP}", f"{m:.2f} Mt CH4/a")
+        self.assertGreater(ureg._format_units_cached.cache_info().hits, 0)
+        self.assertEqual(f"{q:D}", "1.0 megametric_ton CH4 / year")
+        self.assertEqual(f"{1 / Q(1.0, 't CO2eq'):~P}", "1.0 1/t CO2eq")
+        self.assertEqual(
+            f"{q:~L}", r"1.0\ \frac{\mathrm{Mt\_\_CH4}}{\mathrm{a}}"
+        )
+
+        # Check that longer species are preferred over shorter ones.
+        self.assertEqual(ureg._preprocess("t CO2eq"), "t__CO2eq")
+
+    def test_snapshot(self):
+        """Test registry snapshots."""
+        from tempfile import TemporaryDirectory
+
+        from cet_units import UNIT_DEFS_PATH
+        from cet_units.registry import CETUnitRegistry
+
+        with TemporaryDirectory() as tmp:
+            # First call creates the cache folder accessible by the owner only
+            # and stores snapshot, second call loads it.
+            cache_folder = Path(tmp) / "cache"
+            regs = [
+                CETUnitRegistry.from_unit_defs(UNIT_DEFS_PATH, cache_folder)
+                for _ in range(2)
+            ]
+            self.assertEqual(cache_folder.stat().st_mode & 0o077, 0)
+
+            # Storing snapshot with another key deletes other snapshots.
+            next(cache_folder.glob("registry-*.pickle")).unlink()
+            (cache_folder / "registry-stale.pickle").touch()
+            CETUnitRegistry.from_unit_defs(UNIT_DEFS_PATH, cache_folder)
+            self.assertEqual(len(list(cache_folder.glob("*"))), 1)
+
+        # Check that registry loaded from snapshot is equivalent.
+        ureg_cold, ureg_snap = regs
+        self.assertEqual(set(ureg_cold._units), set(ureg_snap._units))
+        self.assertEqual(set(ureg_cold._contexts), set(ureg_snap._contexts))
+        for ureg in regs:
+            ureg.define_flows(["H2"])
+        for expr, unit_to, context in [
+            ("1 USD_2020 / kg_H2", "EUR_2024 / MWh_H2_LHV", None),
+            ("1 Mt CH4", "Mt CO2eq", "AR6GWP100"),
+        ]:
+            q_cold, q_snap = (
+                ureg.Quantity(expr).to(
+                    unit_to, *((context,) if context else ())
+                )
+                for ureg in regs
+            )
+            self.assertEqual(q_cold.m, q_snap.m)
+            self.assertEqual(f"{q_cold}", f"{q_snap}")
+
+    def test_compiled(self):
+        """Test loading compiled definitions."""
+        from decimal import Decimal
+        from shutil import copytree
+        from tempfile import TemporaryDirectory
+
+        from cet_units import UNIT_DEFS_PATH
+        from cet_units._compiled import load_compiled, registry_settings
+        from cet_units.registry import CETUnitRegistry
+
+        self.assertIsNotNone(load_compiled(UNIT_DEFS_PATH))
+        regs = [CETUnitRegistry(), CETUnitRegistry()]
+        regs[0]._setup_cet_defs(UNIT_DEFS_PATH, use_compiled=False)
+        regs[1]._setup_cet_defs(UNIT_DEFS_PATH)
+
+        # Check that registry set up from compiled definitions is equivalent.
+        ureg_text, ureg_compiled = regs
+        self.assertEqual(
+            ureg_text._cache.dimensionality,
+            ureg_compiled._cache.dimensionality,
+        )
+        self.assertEqual(
+            ureg_text._cache.dimensional_equivalents,
+            ureg_compiled._cache.dimensional_equivalents,
+        )
+        for expr, unit_to, context in [
+            ("1 USD_2020", "EUR_2024", None),
+            ("1 Mt CH4", "Mt CO2eq", "AR6GWP100"),
+            ("1 kt C2F6", "t CO2eq", "AR5CCFGWP100"),
+        ]:
+            q_text, q_compiled = (
+                ureg.Quantity(expr).to(
+                    unit_to, *((context,) if context else ())
+                )
+                for ureg in regs
+            )
+            self.assertEqual(q_text.m, q_compiled.m)
+            self.assertEqual(f"{q_text}", f"{q_compiled}")
+
+        # Check that compiled definitions are ignored once outdated.
+        with TemporaryDirectory() as tmp:
+            unit_defs_path = copytree(UNIT_DEFS_PATH, Path(tmp) / "defs")
+            with open(unit_defs_path / "plain.txt", "a") as file_handle:
+                file_handle.write("widget = 2 * kg\n")
+            self.assertIsNone(load_compiled(unit_defs_path))
+            ureg = CETUnitRegistry.from_unit_defs(unit_defs_path)
+            self.assertEqual(ureg.Quantity("1 widget").to("kg").m, 2)
+
+        # Check that compiled definitions are ignored by registries created
+        # with other settings.
+        for kwargs in ({"filename": None}, {"non_int_type": Decimal}):
+            ureg = CETUnitRegistry(**kwargs)
+            self.assertIsNone(
+                load_compiled(UNIT_DEFS_PATH, registry_settings(ureg))
+            )
+            ureg._setup_cet_defs(UNIT_DEFS_PATH)
+            self.assertFalse(ureg._compiled_contexts)
+        self.assertIsInstance(ureg.Quantity("1 kt").to("t").m, Decimal)
+
+    def test_lazy_contexts(self):
+        """Test loading assessment contexts on first use."""
+        from cet_units import UNIT_DEFS_PATH
+        from cet_units.registry import CETUnitRegistry
+
+        ureg = CETUnitRegistry.from_unit_defs(UNIT_DEFS_PATH)
+
+        # Check that contexts are listed but not loaded.
+        self.assertIn("AR6GWP20", ureg.contexts)
+        self.assertNotIn("AR6GWP20", ureg._contexts)
+
+        # Check that contexts are loaded on first use.
+        q = ureg.Quantity("1 Mt CH4").to("Mt CO2eq", "AR6GWP20")
+        self.assertAlmostEqual(q.m, 81.2)
+        self.assertIn("AR6GWP20", ureg._contexts)
+        self.assertNotIn("AR6GWP100", ureg._contexts)
+
+    def test_context_tables(self):
+        """Test assessment contexts stored as tables of factors."""
+        from math import isnan
+
+        from pint import Context
+
+        from cet_units import UNIT_DEFS_PATH
+        from cet_units.registry import CETUnitRegistry
+
+        ureg = CETUnitRegistry.from_unit_defs(UNIT_DEFS_PATH)
+        q = ureg.Quantity(1.0, "t CH4")
+
+        # Check alternating between assessments.
+        for _ in range(2):
+            for assessment, expected in [
+                ("AR6GWP100", 27.9),
+                ("AR5GWP100", 28.0),
+                ("AR4GWP100", 25.0),
+            ]:
+                self.assertEqual(q.to("t CO2eq", assessment).m, expected)
+                with ureg.context(assessment):
+                    self.assertEqual(q.to("kt CO2eq").m, expected / 1000)
+        self.assertFalse(ureg._contexts["AR6GWP100"].redefinitions)
+        self.assertTrue(
+            isnan(ureg.Quantity(1.0, "t C10F18").to("t CO2eq", "AR4GWP100").m)
+        )
+
+        # Check combining with contexts redefining units as in pint.
+        ureg.add_context(
+            Context.from_lines(
+                ["@context custom", "gram__CH4 = gram__CO2eq * 30"],
+                ureg.get_dimensionality,
+            )
+        )
+        q = q.to("t CO2eq", "custom", "AR6GWP100")
+        self.assertEqual(q.m, 30.0)
+        q = ureg.Quantity(1.0, "t N2O").to("t CO2eq", "custom", "AR6GWP100")
+        self.assertEqual(q.m, 273.0)
+
+    def test_flows_on_demand(self):
+        """Test defining flows on demand."""
+        from cet_units import UNIT_DEFS_PATH
+        from cet_units.registry import CETUnitRegistry
+
+        ureg = CETUnitRegistry.from_unit_defs(UNIT_DEFS_PATH)
+
+        # Check that only flows of parsed units are defined.
+        q = ureg.Quantity("1 kg_H2").to("kWh_H2_LHV")
+        self.assertAlmostEqual(q.m, 33.3, places=1)
+        ureg.Unit("bbl_crude_oil")
+        self.assertEqual(ureg._flows, {"H2", "crude_oil"})
+
+        # Check that flows are not defined on demand if disabled.
+        ureg.flows_on_demand = False
+        self.assertNotIn("MWh_NG_LHV", ureg)
+
+    def test_currencies_on_demand(self):
+        """Test defining units of currencies in years on demand."""
+        from cet_units import UNIT_DEFS_PATH
+        from cet_units.registry import CETUnitRegistry
+
+        ureg = CETUnitRegistry.from_unit_defs(UNIT_DEFS_PATH)
+        self.assertNotIn("EUR_2015", ureg._units)
+
+        # Check that only parsed units and the units they refer to are
+        # defined, also with prefixes.
+        q = ureg.Quantity("1 kEUR_2015").to("USD_2024")
+        self.assertEqual(q.m, ureg.Quantity("1000 EUR_2015").to("USD_2024").m)
+        defined = {
+            name
+            for name in ureg._units.maps[-1]
+            if name.startswith(("EUR_", "USD_"))
+        }
+        self.assertEqual(defined, {"EUR_2015", "EUR_2024", "USD_2024"})
+        self.assertNotIn("EUR_1899", ureg)
+
+    def test_unit_index(self):
+        """Test querying the index of flows, currencies and species."""
+        from cet_units import UNIT_DEFS_PATH
+        from cet_units.registry import CETUnitRegistry
+
+        ureg = CETUnitRegistry.from_unit_defs(UNIT_DEFS_PATH)
+
+        # Check that stored flows are indexed when first queried.
+        units = ureg.flow_units("H2")
+        self.assertIn("watt_hour_H2_LHV", units["LHV"]["energy"])
+        self.assertIn("gram_H2", units[""]["mass"])
+        compatible = ureg.compatible_flow_units("kg_H2")
+        self.assertIn("cubic_meter_H2_norm", compatible)
+        self.assertEqual(compatible, ureg.compatible_flow_units("MWh_H2_LHV"))
+        self.assertNotIn("gram_NG", compatible)
+
+        # Check that changing results does not change the index.
+        units["LHV"]["energy"].clear()
+        compatible.clear()
+        self.assertTrue(ureg.flow_units("H2")["LHV"]["energy"])
+        self.assertTrue(ureg.compatible_flow_units("kg_H2"))
+        with self.assertRaises(ValueError):
+            ureg.flow_units("H2x")
+        with self.assertRaises(ValueError):
+            ureg.compatible_flow_units("kg")
+
+        self.assertIn(2015, ureg.currency_years("EUR"))
+        self.assertIn("AR6GWP100", ureg.species_contexts("CH4"))
+        self.assertEqual(ureg.species_contexts("CO2"), list(ureg.assessments))
+
+    def test_define_many(self):
+        """Test adding definitions in one batch."""
+        from cet_units import UNIT_DEFS_PATH
+        from cet_units.registry import CETUnitRegistry
+
+        ureg = CETUnitRegistry.from_unit_defs(UNIT_DEFS_PATH)
+        ureg.define_flows(["H2", "NG"])
+        ureg.define_many(["widget = 2 * kg_H2", "gadget = 3 * widget"])
+
+        # Check that compatible units match those of a rebuilt cache.
+        uc = ureg.Unit("kg_H2")._units
+        compatible = ureg._get_compatible_units(uc, "")
+        self.assertIn("gadget", compatible)
+        ureg._build_cache()
+        self.assertEqual(compatible, ureg._get_compatible_units(uc, ""))
+        q = ureg.Quantity("1 gadget").to("kWh_H2_LHV")
+        self.assertAlmostEqual(q.m, 200.0, places=1)
+
+    def test_conversion_cache(self):
+        """Test caching of conversion factors."""
+        from pint import Context
+
+        from cet_units import UNIT_DEFS_PATH
+        from cet_units.registry import CETUnitRegistry
+
+        ureg = CETUnitRegistry.from_unit_defs(UNIT_DEFS_PATH)
+
+        # Check that repeated conversions hit the cache.
+        for _ in range(3):
+            q = ureg.Quantity("1 Mt CH4").to("Mt CO2eq", "AR6GWP100")
+            self.assertAlmostEqual(q.m, 27.9)
+        info = ureg.conversion_cache_info()
+        self.assertEqual((info.hits, info.misses), (2, 1))
+
+        # Check that cached factors are not used within other contexts.
+        with ureg.context("AR5GWP100"):
+            q = ureg.Quantity("1 Mt CH4").to("Mt CO2eq")
+        self.assertAlmostEqual(q.m, 28.0)
+
+        # Check that cached and uncached conversions are identical.
+        q = ureg.Quantity(3.0, "USD_2020 / kg_H2")
+        dst = ureg.Unit("EUR_2024 / MWh_H2_LHV")
+        self.assertEqual(q.to(dst).m, ureg.convert(q.m, q.units, dst))
+
+        # Check that non-multiplicative conversions are still correct.
+        self.assertAlmostEqual(ureg.Quantity(20, "degC").to("K").m, 293.15)
+
+        # Check that defining units clears the cache.
+        ureg.define_flows(["NH3"])
+        self.assertEqual(ureg.conversion_cache_info().currsize, 0)
+
+        # Check that replacing a context clears the cache.
+        ureg.define("widget = kg")
+        for factor in (2, 3):
+            if "test" in ureg.contexts:
+                ureg.remove_context("test")
+            ctx = Context("test")
+            ctx.redefine(f"widget = {factor} * kg")
+            ureg.add_context(ctx)
+            q = ureg.Quantity("1 widget").to("kg", "test")
+            self.assertEqual(q.m, factor)
+
+    def test_stats(self):
+        """Test counting and timing phases of the registry."""
+        from cet_units import UNIT_DEFS_PATH
+        from cet_units.registry import CETUnitRegistry
+
+        ureg = CETUnitRegistry.from_unit_defs(UNIT_DEFS_PATH)
+        events = []
+        ureg.enable_stats(lambda phase, t: events.append(phase))
+        for _ in range(2):
+            q = ureg.Quantity(1.0, "Mt CH4").to("Mt CO2eq", "AR6GWP100")
+            f"{q}"
+        for s in ("2 kt CH4", "3 t CO2eq / a"):
+            ureg.Quantity(s)
+        ureg.disable_stats()
+        ureg.Quantity(1.0, "t CH4").to("kt CH4")
+
+        # Check that calls are counted only while enabled.
+        stats = ureg.stats()
+        self.assertEqual(stats.calls["convert_context"], 2)
+        self.assertEqual(stats.calls["format"], 2)
+        self.assertNotIn("convert", stats.calls)
+        self.assertEqual(stats.calls["parse_expression"], 2)
+        self.assertEqual(
+            stats.calls["preprocess"],
+            stats.calls["parse_expression"] + stats.calls["parse_units"],
+        )
+        self.assertEqual(
+            stats.most_common("convert_context"),
+            [("megametric_ton__CH4 -> megametric_ton__CO2eq [AR6GWP100]", 2)],
+        )
+        self.assertEqual(len(events), stats.calls.total())
+
+    def test_freeze(self):
+        """Test converting concurrently with a frozen registry."""
+        from concurrent.futures import ThreadPoolExecutor
+
+        from cet_units import UNIT_DEFS_PATH
+        from cet_units.registry import CETUnitRegistry
+
+        ureg = CETUnitRegistry.from_unit_defs(UNIT_DEFS_PATH)
+        cases = [("Mt CH4", "Mt CO2eq", a) for a in ureg.assessments] + [
+            ("kg_H2", "kWh_H2_LHV", None),
+            ("EUR_2015", "USD_2024", None),
+            ("degC", "K", None),
+        ]
+
+        def convert(case):
+            src, dst, context = case
+            q = ureg.Quantity(1.5, src)
+            return (q.to(dst, context) if context else q.to(dst)).m
+
+        expected = [convert(case) for case in cases]
+
+        # Check that results of many threads match sequential results.
+        ureg = CETUnitRegistry.from_unit_defs(UNIT_DEFS_PATH)
+        ureg.freeze()
+        with ThreadPoolExecutor(8) as executor:
+            results = list(executor.map(convert, cases * 200))
+        self.assertEqual(results, expected * 200)
+
+        # Check that the frozen registry cannot be changed.
+        with self.assertRaises(RuntimeError):
+            ureg.define("widget = 2 * kg")
+        with self.assertRaises(RuntimeError):
+            with ureg.context("AR6GWP100"):
+                pass
+
+        # Check that matrices of emission metrics can still be computed.
+        matrix = ureg.gwp_matrix()
+        i = matrix.species.index("CH4")
+        j = matrix.assessments.index("AR6GWP100")
+        self.assertAlmostEqual(matrix.factors[i, j], 27.9)
+
+    def test_freeze_stress(self):
+        """Test converting in new contexts while other threads parse."""
+        import sys
+        from concurrent.futures import ThreadPoolExecutor
+        from itertools import permutations, product
+
+        from cet_units import UNIT_DEFS_PATH
+        from cet_units.registry import CETUnitRegistry
+
+        def convert(ureg, contexts):
+            return ureg.Quantity(1.5, "Mt CH4").to("Mt CO2eq", *contexts).m
+
+        def parse(ureg, s):
+            # Also check that the units and cache used for parsing are not
+            # switched by conversions in contexts.
+            q = ureg.Quantity(s)
+            return (
+                f"{q:~P}",
+                f"{q.to_base_units():~P}",
+                len(ureg._units.maps),
+                ureg._cache is ureg._caches[()],
+            )
+
+        ureg = CETUnitRegistry.from_unit_defs(UNIT_DEFS_PATH)
+        pairs = list(permutations(ureg.assessments, 2))
+        strings = [
+            f"1.5 {prefix}{unit}/{time}"
+            for prefix, unit, time in product(
+                ["", "k", "M", "G", "m", "c"],
+                ["g", "Wh", "l", "EUR_2020", "g_H2", "t CH4", "g CO2eq"],
+                ["a", "d"],
+            )
+        ]
+        tasks = [(convert, pair) for pair in pairs]
+        for i, s in enumerate(strings):
+            tasks.insert(3 * i % len(tasks), (parse, s))
+        expected = [func(ureg, arg) for func, arg in tasks]
+
+        # Check that results of threads using combinations of contexts for the
+        # first time match sequential results, switching threads often.
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            for _ in range(3):
+                ureg = CETUnitRegistry.from_unit_defs(UNIT_DEFS_PATH)
+                ureg.freeze()
+                with ThreadPoolExecutor(8) as executor:
+                    results = list(
+                        executor.map(
+                            lambda task: task[0](ureg, task[1]), tasks
+                        )
+                    )
+                self.assertEqual(results, expected)
+        finally:
+            sys.setswitchinterval(interval)
+
+    def test_pickle(self):
+        """Test pickling quantities with a reference to their registry."""
+        import gc
+        import multiprocessing
+        import pickle
+        import weakref
+        from concurrent.futures import ProcessPoolExecutor
+        from operator import methodcaller
+
+        import numpy as np
+
+        from cet_units import UNIT_DEFS_PATH
+        from cet_units.registry import CETUnitRegistry, _unpickle_registry
+
+        ureg = CETUnitRegistry.from_unit_defs(UNIT_DEFS_PATH)
+        ureg.define_flows(
+            {"fuel": {"name": "Fuel", "energycontent_LHV": "10 MJ/kg"}}
+        )
+
+        # Check that array magnitudes are pickled out-of-band.
+        q = ureg.Quantity(np.arange(1000.0), "t CH4")
+        buffers = []
+        data = pickle.dumps(q, protocol=5, buffer_callback=buffers.append)
+        self.assertEqual(len(buffers), 1)
+        q_loaded = pickle.loads(data, buffers=buffers)
+        self.assertIs(q_loaded._REGISTRY, ureg)
+        self.assertTrue(np.shares_memory(q_loaded.m, q.m))
+
+        # Check that quantities are unpickled onto the registry that pickled
+        # them, without changing other registries of the same definitions.
+        ureg_other = CETUnitRegistry.from_unit_defs(UNIT_DEFS_PATH)
+        ureg_other.define_flows(
+            {"fuel2": {"name": "Fuel 2", "energycontent_LHV": "20 MJ/kg"}}
+        )
+        ureg.freeze()
+        q = pickle.loads(pickle.dumps(ureg_other.Quantity(1.0, "kg_fuel2")))
+        self.assertIs(q._REGISTRY, ureg_other)
+        self.assertNotIn("fuel2", ureg._flows)
+
+        # Check that registries pickled in other processes from unit
+        # definitions stored elsewhere are replaced by one with the same
+        # definitions, and that registries are not kept alive.
+        key = ureg._fingerprint()[1]
+        ureg_loaded = _unpickle_registry(("/moved/unit_definitions", key), {})
+        self.assertEqual(ureg_loaded._fingerprint()[1], key)
+        ureg_ref = weakref.ref(ureg_other)
+        del q, ureg_other
+        gc.collect()
+        self.assertIsNone(ureg_ref())
+
+        # Check that flows defined at runtime are available in workers.
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(1, mp_context=context) as executor:
+            q = executor.submit(
+                methodcaller("to", "kWh_fuel_LHV"),
+                ureg.Quantity(1.0, "kg_fuel"),
+            ).result()
+        self.assertIs(q._REGISTRY, ureg)
+        self.assertAlmostEqual(q.m, 2.7778, places=4)
+
+    def test_converter(self):
+        """Test converters."""
+        import pickle
+
+        from cet_units import Q, ureg
+
+        # Check that converters give the same results as quantities.
+        c = ureg.converter("t CH4/a", "Mt CO2eq/a", context="AR6GWP100")
+        q = Q("2 t CH4/a").to("Mt CO2eq/a", "AR6GWP100")
+        self.assertEqual(c(2.0), q.m)
+
+        # Check that converters can be pickled.
+        self.assertEqual(pickle.loads(pickle.dumps(c)), c)
+
+        # Check that non-multiplicative conversions are rejected.
+        with self.assertRaises(ValueError):
+            ureg.converter("degC", "K")
+        with self.assertRaisesRegex(ValueError, "Unknown context: AR7"):
+            ureg.converter("t CH4", "t CO2eq", context="AR7")
+
+    def test_convert_table(self):
+        """Test conversion of long-format tables."""
+        import pandas as pd
+
+        from cet_units import convert_table
+
+        data = pd.DataFrame(
+            {
+                "value": [1.0, 2.0, 3.0, 4.0, 5.0],
+                "unit": ["kt CH4", "Mt CO2", "kg", "kt CH4", "kt C10F18"],
+                "context": [
+                    "AR6GWP100",
+                    None,
+                    None,
+                    "AR5GWP100",
+                    "SARGWP100",
+                ],
+            }
+        )
+        result, errors = convert_table(data, "Mt CO2eq", context_col="context")
+
+        # Check that convertible rows are converted, including to NaN for
+        # species without metric in an assessment.
+        self.assertEqual(errors.tolist(), [False, False, True, False, False])
+        self.assertAlmostEqual(result["value"][0], 0.0279)
+        self.assertAlmostEqual(result["value"][3], 0.112)
+        self.assertEqual(result["unit"][1], "Mt CO2eq")
+        self.assertTrue(pd.isna(result["value"][4]))
+
+        # Check that unconvertible rows are kept unchanged.
+        self.assertEqual(
+            result.loc[2, ["value", "unit"]].tolist(), [3.0, "kg"]
+        )
+
+        # Check that conversions that are not multiplications are applied.
+        data = pd.DataFrame(
+            {"value": [0.0, 100.0, 1.0], "unit": ["degC", "degC", "foo"]}
+        )
+        result, errors = convert_table(data, "degF")
+        self.assertEqual(errors.tolist(), [False, False, True])
+        self.assertAlmostEqual(result["value"][0], 32.0)
+        self.assertAlmostEqual(result["value"][1], 212.0)
+
+    def test_convert_stream(self):
+        """Test batch mode of the command-line interface."""
+        import json
+        from io import StringIO
+
+        from cet_units_convert._cli import convert_stream
+
+        file_in = StringIO(
+            "from 1 kt CH4 to Mt CO2eq --context AR6GWP100\n"
+            "from 1 kt foo to kg\n"
+            "from 1 kt CH4 to Mt CO2eq\n"
+        )
+        file_out = StringIO()
+        n_errors = convert_stream(file_in, file_out, "lines", "AR5GWP100")
+
+        # Check that one result is written per line, including errors.
+        self.assertEqual(n_errors, 1)
+        self.assertEqual(
+            file_out.getvalue().splitlines(),
+            [
+                "0.027899999999999998 Mt CO2eq",
+                "",
+                "0.027999999999999997 Mt CO2eq",
+            ],
+        )
+
+        # Check that records with errors keep their fields.
+        file_in = StringIO('{"id": 1, "from": "1 kt foo", "to": "kg"}\n[]\n')
+        file_out = StringIO()
+        n_errors = convert_stream(file_in, file_out, "jsonl", None)
+        self.assertEqual(n_errors, 2)
+        records = [
+            json.loads(line) for line in file_out.getvalue().splitlines()
+        ]
+        self.assertEqual(records[0]["id"], 1)
+        self.assertIn("error", records[0])
+        self.assertEqual(list(records[1]), ["error"])
+
+    def test_search(self):
+        """Test searching names without the registry."""
+        from tempfile import TemporaryDirectory
+
+        import subprocess
+        import sys
+
+        from cet_units import UNIT_DEFS_PATH
+        from cet_units.registry import CETUnitRegistry
+        from cet_units_convert import _search
+        from cet_units_convert._search import SEARCH_FILE, SearchIndex
+
+        ureg = CETUnitRegistry.from_unit_defs(UNIT_DEFS_PATH)
+        index = SearchIndex.from_registry(ureg)
+        with TemporaryDirectory() as tmp_dir:
+            (Path(tmp_dir) / "generated").mkdir()
+            index.save(Path(tmp_dir) / "generated" / SEARCH_FILE)
+            self.assertEqual(SearchIndex.load(Path(tmp_dir)), index)
+
+        # Check that names are found exactly, also with prefixes, and by
+        # prefix and similarity.
+        for query in ("MWh_NG_HHV", "MWh NG HHV"):
+            (match,) = index.search(query, ("units",), 1)
+            self.assertEqual(match.name, "megawatt_hour_NG_HHV")
+        self.assertEqual(
+            match.info, str(ureg.Unit("MWh_NG_HHV").dimensionality)
+        )
+        self.assertEqual(
+            index.search("t__CH4", limit=1)[0].name, "metric_ton__CH4"
+        )
+        names = [m.name for m in index.search("ar6gwp", ("contexts",))]
+        self.assertIn("AR6GWP100", names)
+        self.assertIn("H2", dict(index.names("flows")))
+
+        # Check that close names are suggested for unknown units.
+        self.assertTrue(index.is_unit("kWh_H2_LHV"))
+        self.assertFalse(index.is_unit("kWh_H2_HLV"))
+        self.assertIn("kWh_H2_LHV", index.suggest("kWh_H2_HLV"))
+
+        # Check that listing and searching do not import the registry, and
+        # stop quietly if the output is closed early.
+        self.assertEqual(_search.UNIT_DEFS_PATH, UNIT_DEFS_PATH)
+        code = (
+            "import sys; from cet_units_convert._cli import convert; "
+            "sys.argv[1:] = {}; convert(); "
+            "print('cet_units' in sys.modules, file=sys.stderr)"
+        )
+        for args in (["--list", "flows"], ["--search", "MWh NG HHV"]):
+            result = subprocess.run(
+                [sys.executable, "-c", code.format(args)],
+                capture_output=True,
+                text=True,
+            )
+            self.assertEqual(result.returncode, 0)
+            self.assertTrue(result.stdout)
+            self.assertEqual(result.stderr.strip(), "False")
+            with subprocess.Popen(
+                [sys.executable, "-c", code.format(args)],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+            ) as process:
+                process.stdout.close()
+                self.assertEqual(process.stderr.read(), b"")
+            self.assertEqual(process.returncode, 1)
+
+    def test_server(self):
+        """Test conversion server and client."""
+        import socketserver
+        import subprocess
+        import sys
+        from tempfile import TemporaryDirectory
+        from threading import Thread
+
+        from cet_units_convert._server import ConversionHandler, request
+
+        # Check that the client does not import the registry.
+        code = (
+            "import sys, cet_units_convert._cli; "
+            "print('cet_units' in sys.modules)"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True
+        )
+        self.assertEqual(result.stdout.strip(), "False")
+
+        with TemporaryDirectory() as tmp_dir:
+            socket_path = Path(tmp_dir) / "test.sock"
+
+            # Check that client falls back if server is not running.
+            record = {"from": "1 kg_H2", "to": "kWh_H2_LHV"}
+            self.assertIsNone(request(socket_path, record))
+
+            # Check that client receives results and errors from server.
+            server = socketserver.ThreadingUnixStreamServer(
+                str(socket_path), ConversionHandler
+            )
+            Thread(target=server.serve_forever, daemon=True).start()
+            try:
+                response = request(socket_path, record)
+                self.assertEqual(
+                    response, {"result": "33.333333333333336 kWh_H2_LHV"}
+                )
+                response = request(socket_path, {"from": "1 kg", "to": "MWh"})
+                self.assertIn("error", response)
+            finally:
+                server.shutdown()
+                server.server_close()
+
+    def test_gwp_matrix(self):
+        """Test matrix of emission metrics and aggregation."""
+        import numpy as np
+
+        from cet_units import Q, ureg
+
+        matrix = ureg.gwp_matrix()
+        self.assertEqual(matrix.factors.shape, (len(matrix.species), 11))
+
+        # Check that factors agree with conversions in contexts.
+        i = matrix.species.index("N2O")
+        for j, assessment in enumerate(matrix.assessments):
+            q = Q("1 t N2O").to("t CO2eq", assessment)
+            np.testing.assert_equal(matrix.factors[i, j], q.m)
+
+        # Check that inventories are aggregated for one or all assessments.
+        masses, species = [1.0, 2.0, 3.0], ["CH4", "CO2", "CH4"]
+        self.assertAlmostEqual(
+            matrix.aggregate(masses, species, "AR6GWP100"), 2 + 4 * 27.9
+        )
+        totals = matrix.aggregate(masses, species)
+        self.assertEqual(totals.shape, (len(matrix.assessments),))
+
+    def test_currency_table(self):
+        """Test table of currencies and vectorized conversion."""
+        import numpy as np
+
+        from cet_units import Q, ureg
+
+        table = ureg.currency_table()
+        self.assertEqual(table.reference, "USD_2024")
+
+        # Check that vectorized conversions agree with unit conversions.
+        values = np.array([1.0, 2.0, 3.0])
+        currencies = np.array(["EUR", "USD", "USD"])
+        years = np.array([2010, 2015, 2030])
+        result = table.convert(values, currencies, years, "EUR", 2024)
+        self.assertEqual(result[0], Q("1 EUR_2010").to("EUR_2024").m)
+        self.assertEqual(result[1], Q("2 USD_2015").to("EUR_2024").m)
+
+        # Check that undefined years give NaN.
+        self.assertTrue(np.isnan(result[2]))
+
+    def test_generate_flow_defs(self):
+        """Test generating definitions of flow units."""
+        from cet_units import UNIT_DEFS_PATH
+        from cet_units.registry import CETUnitRegistry
+
+        ureg = CETUnitRegistry.from_unit_defs(UNIT_DEFS_PATH)
+        flow_specs = {
+            "name": "Methane",
+            "energycontent_LHV": "47390.8561333507 Btu/kg",
+            "density_norm": "0.66816 kg/m^3",
+            "density_std": "0.71746",
+            "c_ratio": "0.75",
+        }
+
+        # Check that definition objects are equal to parsed definitions.
+        defs = ureg.generate_units_defs_flow("CH4x", flow_specs)
+        parsed = ureg._def_parser.iter_parsed_project(
+            ureg._def_parser.parse_string(defs)
+        )
+        generated = ureg._generate_flow_defs("CH4x", flow_specs)
+        for d_parsed, d in zip(parsed, filter(None, generated), strict=True):
+            self.assertEqual(d[0], d_parsed.raw)
+            self.assertEqual(d[1].converter, d_parsed.converter)
+            self.assertEqual(
+                list(d[1].reference.items()), list(d_parsed.reference.items())
+            )
+
+        # Check that flows defined from specifications convert correctly.
+        ureg.define_flows({"CH4x": flow_specs})
+        q = ureg.Quantity("1 kg_CH4x").to("MWh_CH4x_LHV")
+        self.assertAlmostEqual(q.m, 0.0139, places=4)